@@ -1,5 +1,7 @@
-from shared.messaging import Message, MessageRouter
-from shared.network import Connection
+from pathlib import Path
+
+from shared.messaging import Message, MessageRouter, metrics
+from shared.network import Connection, transfer_store
 
 from .services import core
 
@@ -12,6 +14,15 @@ def status(conn: Connection, _: Message):
     conn.send(response)
 
 
+@router.register("metrics")
+def get_metrics(conn: Connection, msg: Message):
+    snapshot = metrics.snapshot()
+    if msg.data and msg.data.get("reset", False):
+        metrics.reset()
+
+    conn.send(Message("metrics", snapshot))
+
+
 @router.register("file.open")
 def open_file(conn: Connection, msg: Message):
     if msg.data is None:
@@ -37,6 +48,8 @@ def save_file_as(conn: Connection, msg: Message):
         return
     globalize = msg.data.get("globalize_textures", False)
 
+    # the studio may fetch the exported files through the transfer routes
+    transfer_store.allow_download(Path(path).parent)
     res = core.save_file_as(path, globalize)
     if res:
         conn.send(Message("success"))
@@ -1,6 +1,8 @@
+from pathlib import Path
+
 from shared.logger import Logger
 from shared.messaging import Message, MessageRouter
-from shared.network import Connection
+from shared.network import Connection, transfer_store
 
 from .services import core, materials
 
@@ -20,6 +22,8 @@ def export_materials(conn: Connection, msg: Message):
         return
     globalize = msg.data.get("globalize_textures", False)
 
+    # the studio may fetch the exported files through the transfer routes
+    transfer_store.allow_download(Path(msg.data["path"]))
     ok = materials.export_materials(
         msg.data["materials"], msg.data["path"], globalize_textures=globalize
     )
@@ -1,6 +1,8 @@
+from pathlib import Path
+
 from shared.logger import Logger
 from shared.messaging import Message, MessageRouter
-from shared.network import Connection
+from shared.network import Connection, transfer_store
 
 from .services import core, models
 
@@ -19,6 +21,8 @@ def export_selected(conn: Connection, msg: Message):
     globalize = msg.data.get("globalize_textures", False)
 
     Logger.debug(f"exporting selected models to {path}")
+    # the studio may fetch the exported files through the transfer routes
+    transfer_store.allow_download(Path(path).parent)
     models.export_selected(path, globalize)
 
     conn.send(Message("success"))
@@ -0,0 +1,24 @@
+from shared.messaging import Message, MessageRouter
+from shared.network import Connection
+
+from ..scene_watcher import SceneWatcher
+from .services import scene
+
+router = MessageRouter("scene.")
+watcher = SceneWatcher(scene.snapshot)
+
+
+@router.register("subscribe")
+def subscribe(conn: Connection, _: Message):
+    conn.send(Message("scene", watcher.subscribe(conn)))
+
+
+@router.register("unsubscribe")
+def unsubscribe(conn: Connection, _: Message):
+    watcher.unsubscribe(conn)
+    conn.send(Message("success"))
+
+
+@router.register("snapshot")
+def snapshot(conn: Connection, _: Message):
+    conn.send(Message("scene", scene.snapshot()))
@@ -1,7 +1,37 @@
+from contextlib import contextmanager
+from typing import Generator
+
 import c4d
 
 from shared.logger import Logger
 
+_event_scope_depth = 0
+_event_pending = False
+
+
+def event_add() -> None:
+    global _event_pending
+
+    if _event_scope_depth:
+        _event_pending = True
+        return
+
+    c4d.EventAdd()
+
+
+@contextmanager
+def coalesced_events() -> Generator[None]:
+    global _event_scope_depth, _event_pending
+
+    _event_scope_depth += 1
+    try:
+        yield
+    finally:
+        _event_scope_depth -= 1
+        if not _event_scope_depth and _event_pending:
+            _event_pending = False
+            c4d.EventAdd()
+
 
 def import_file(file_path: str) -> bool:
     result = c4d.documents.MergeDocument(
@@ -52,4 +82,4 @@ def load_xref(file_path: str):
     fileId = c4d.DescID(c4d.DescLevel(c4d.ID_CA_XREF_FILE, c4d.DTYPE_FILENAME, 0))
     obj.SetParameter(fileId, file_path, c4d.DESCFLAGS_SET_USERINTERACTION)  # type: ignore
 
-    c4d.EventAdd()
+    event_add()
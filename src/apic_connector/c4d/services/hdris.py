@@ -2,6 +2,8 @@ from pathlib import Path
 
 import c4d
 
+from .core import event_add
+
 
 def hdri_import_as_dome(path: Path):
     RS_LIGHT_TYPE_DOME = 4
@@ -12,7 +14,7 @@ def hdri_import_as_dome(path: Path):
     light.SetName(path.stem)
 
     c4d.documents.GetActiveDocument().InsertObject(light)
-    c4d.EventAdd()
+    event_add()
 
 
 def hdri_import_as_area(path: Path):
@@ -24,4 +26,4 @@ def hdri_import_as_area(path: Path):
     light.SetName(path.stem)
 
     c4d.documents.GetActiveDocument().InsertObject(light)
-    c4d.EventAdd()
+    event_add()
@@ -0,0 +1,31 @@
+import os
+from typing import Any
+
+import c4d
+
+from .materials import get_material_names
+
+
+def get_document_path() -> str:
+    doc = c4d.documents.GetActiveDocument()
+    return os.path.join(doc.GetDocumentPath(), doc.GetDocumentName())
+
+
+def get_object_names() -> list[str]:
+    doc = c4d.documents.GetActiveDocument()
+    return [o.GetName() for o in doc.GetObjects()]
+
+
+def get_selected_names() -> list[str]:
+    doc = c4d.documents.GetActiveDocument()
+    sel = doc.GetActiveObjects(c4d.GETACTIVEOBJECTFLAGS_NONE)
+    return [o.GetName() for o in sel]
+
+
+def snapshot() -> dict[str, Any]:
+    return {
+        "document": get_document_path(),
+        "materials": get_material_names(),
+        "objects": get_object_names(),
+        "selection": get_selected_names(),
+    }
@@ -0,0 +1,116 @@
+import heapq
+import time
+from enum import IntEnum
+from itertools import count
+from queue import Empty, Queue
+from threading import Lock
+from typing import Callable, Optional
+
+from shared.messaging import BATCH_MESSAGE, Message, metrics
+from shared.messaging.metrics import QUEUE_WAIT
+from shared.network import Connection
+
+QueueItem = tuple[Connection, Message]
+WakeupFunc = Callable[[], None]
+ServeFunc = Callable[[QueueItem], None]
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+ROUTE_PRIORITIES: dict[str, Priority] = {
+    "core.status": Priority.HIGH,
+    "core.metrics": Priority.HIGH,
+    "materials.list": Priority.HIGH,
+    "scene.subscribe": Priority.HIGH,
+    "scene.unsubscribe": Priority.HIGH,
+    "scene.snapshot": Priority.HIGH,
+    "hdris.import.domelight": Priority.NORMAL,
+    "hdris.import.arealight": Priority.NORMAL,
+    "models.reference": Priority.NORMAL,
+    "core.file.open": Priority.LOW,
+    "core.file.save_as": Priority.LOW,
+    "models.import": Priority.LOW,
+    "models.export.selected": Priority.LOW,
+    "models.export.all": Priority.LOW,
+    "materials.import": Priority.LOW,
+    "materials.export": Priority.LOW,
+    BATCH_MESSAGE: Priority.LOW,
+}
+
+
+def route_priority(message: str) -> Priority:
+    return ROUTE_PRIORITIES.get(message, Priority.NORMAL)
+
+
+class WakeupQueue(Queue[QueueItem]):
+    def __init__(self, wakeup: WakeupFunc, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self.wakeup = wakeup
+        self._wakeup_lock = Lock()
+        self._wakeup_pending = False
+
+    def put(
+        self, item: QueueItem, block: bool = True, timeout: Optional[float] = None
+    ) -> None:
+        super().put(item, block, timeout)
+        self.request_wakeup()
+
+    def request_wakeup(self) -> None:
+        # one pending wakeup is enough, the consumer drains everything queued
+        with self._wakeup_lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+
+        self.wakeup()
+
+    def clear_wakeup(self) -> None:
+        with self._wakeup_lock:
+            self._wakeup_pending = False
+
+    def process(self, serve: ServeFunc, budget: float) -> None:
+        self.clear_wakeup()
+        deadline = time.perf_counter() + budget
+
+        while True:
+            try:
+                item = self.get_nowait()
+            except Empty:
+                return
+
+            serve(item)
+            if time.perf_counter() >= deadline:
+                break
+
+        # hand control back to cinema 4d and continue with the rest next tick
+        if not self.empty():
+            self.request_wakeup()
+
+
+class MessageQueue(WakeupQueue):
+    def __init__(self, wakeup: WakeupFunc, maxsize: int = 64) -> None:
+        super().__init__(wakeup, maxsize)
+
+    # the following hooks are called by Queue with its mutex held
+    def _init(self, maxsize: int) -> None:
+        self.queue: list[tuple[Priority, int, float, QueueItem]] = []  # type: ignore
+        self._seq = count()
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: QueueItem) -> None:
+        _, message = item
+        priority = route_priority(message.message)
+        entry = (priority, next(self._seq), time.perf_counter(), item)
+        heapq.heappush(self.queue, entry)
+
+    def _get(self) -> QueueItem:
+        _, _, enqueued, item = heapq.heappop(self.queue)
+        waited = (time.perf_counter() - enqueued) * 1000
+        metrics.observe(item[1].message, QUEUE_WAIT, waited)
+        return item
@@ -0,0 +1,80 @@
+import time
+from typing import Any, Callable, Optional
+
+from shared.messaging import Message
+from shared.messaging.events import DOCUMENT_EVENT, SCENE_EVENTS
+from shared.network import Connection
+
+Snapshot = dict[str, Any]
+SnapshotFunc = Callable[[], Snapshot]
+
+
+def diff_snapshots(previous: Snapshot, current: Snapshot) -> list[Message]:
+    if previous["document"] != current["document"]:
+        return [Message(DOCUMENT_EVENT, current)]
+
+    events: list[Message] = []
+    for key, event in SCENE_EVENTS.items():
+        if previous[key] == current[key]:
+            continue
+
+        old, new = set(previous[key]), set(current[key])
+        data = {
+            key: current[key],
+            "added": sorted(new - old),
+            "removed": sorted(old - new),
+        }
+        events.append(Message(event, data))
+
+    return events
+
+
+class SceneWatcher:
+    MIN_INTERVAL = 0.2
+
+    def __init__(self, snapshot: SnapshotFunc) -> None:
+        self.snapshot = snapshot
+        self.subscribers: set[Connection] = set()
+        self._last: Optional[Snapshot] = None
+        self._last_check = 0.0
+        self._dirty = False
+
+    def subscribe(self, conn: Connection) -> Snapshot:
+        self.check(force=True)
+        self.subscribers.add(conn)
+        if self._last is None:
+            self._last = self.snapshot()
+
+        return self._last
+
+    def unsubscribe(self, conn: Connection) -> None:
+        self.subscribers.discard(conn)
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+
+    def check(self, force: bool = False) -> None:
+        self.subscribers = {c for c in self.subscribers if c.is_connected}
+        if not self.subscribers:
+            self._last = None
+            return
+
+        # EVMSG_CHANGE fires for every edit, snapshots walk the document so
+        # they are rate limited and the timer picks up the trailing change
+        now = time.monotonic()
+        too_soon = now - self._last_check < self.MIN_INTERVAL
+        if not force and (not self._dirty or too_soon):
+            return
+
+        self._dirty = False
+        self._last_check = now
+        previous, self._last = self._last, self.snapshot()
+        if previous is None:
+            return
+
+        for event in diff_snapshots(previous, self._last):
+            self.publish(event)
+
+    def publish(self, event: Message) -> None:
+        for conn in list(self.subscribers):
+            conn.send(event)
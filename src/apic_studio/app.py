@@ -1,13 +1,12 @@
 import logging
 import sys
 from pathlib import Path
-from threading import Thread
 
 from PySide6.QtWidgets import QApplication
 
 from apic_studio.core import db
 from apic_studio.core.settings import SettingsManager
-from apic_studio.services import DCCBridge, PingService
+from apic_studio.services import AsyncDCCBridge, DCCBridge, RenderWorkerPool
 from apic_studio.ui.main_window import MainWindow
 from shared.logger import Logger
 from shared.network import Connection
@@ -18,7 +17,8 @@ class Application:
         self.settings = SettingsManager()
         self.app = QApplication(sys.argv)
         self.connection = Connection.client_connection(timeout=5)
-        self.dcc = DCCBridge(self.connection)
+        self.render_pool = RenderWorkerPool()
+        self.dcc = AsyncDCCBridge(DCCBridge(self.connection, self.render_pool))
         self.window: MainWindow
 
     def init(self):
@@ -32,6 +32,9 @@ class Application:
 
         db.init_db()
 
+        # c4dpy takes a while to start, spawn the render workers up front
+        self.render_pool.start()
+
         self.app.setStyle("Fusion")
         self.window = MainWindow(self.dcc, self.settings)
 
@@ -44,18 +47,14 @@ class Application:
         except ConnectionRefusedError as e:
             Logger.exception(e)
 
+        self.dcc.stop()
+        self.render_pool.stop()
         self.app.exit()
 
     def run(self):
         Logger.info("starting Apic Studio...")
 
-        Thread(
-            target=self.connection.connect,
-            args=(self.settings.CoreSettings.address,),
-            daemon=True,
-        ).start()
-
-        PingService(self.connection)
+        self.dcc.connect(self.settings.CoreSettings.address)
 
         self.window.show()
         self.app.exec()
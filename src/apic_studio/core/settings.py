@@ -65,6 +65,11 @@ class MaterialSettings(Settings):
         self.render_cam = "renderCam"
         self.render_res_x = 350
         self.render_res_y = 350
+        # 0 picks a value from the number of cores
+        self.render_processes = 0
+        self.render_threads = 0
+        # seconds without output before a c4dpy render process is killed
+        self.render_timeout = 600
 
 
 @register
@@ -112,6 +117,10 @@ class CoreSettings(Settings):
         self._local = self._win_local if sys.platform == "win32" else self._win_local
         self.socket_addr = "localhost"
         self.socket_port = 1337
+        # copied textures are deduplicated through <pool>/.texstore
+        self.texture_store = False
+        # backups are chunked and deduplicated through <pool>/.backups
+        self.chunked_backups = True
         self.root_path = str(Path(__file__).parent.parent.parent)
         self.config_path = str(self._local / f"config-{gethostname()}.json")
         self.db_path = str(Path(self.root_path, "apic_studio.db"))
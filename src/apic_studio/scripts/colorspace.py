@@ -0,0 +1,54 @@
+from typing import Callable, Optional
+
+# kept free of c4d imports so the conversion can run outside of cinema 4d
+
+Transfer = Callable[[float], float]
+Transform = Callable[[float, float, float], tuple[float, float, float]]
+
+
+def srgb_encode(value: float) -> float:
+    if value <= 0.0031308:
+        return value * 12.92
+
+    return 1.055 * value ** (1 / 2.4) - 0.055
+
+
+def to_byte(value: float) -> int:
+    # rounded so white stays 255
+    return max(0, min(255, round(value * 255)))
+
+
+def build_lut(transfer: Transfer = srgb_encode) -> bytes:
+    # one entry per 8 bit channel value, only exact for per channel transfers
+    return bytes(to_byte(transfer(i / 255.0)) for i in range(256))
+
+
+def apply_lut(data: bytes | bytearray | memoryview, lut: bytes) -> bytes:
+    if len(lut) != 256:
+        raise ValueError(f"lut needs 256 entries, got {len(lut)}")
+
+    return bytes(data).translate(lut)
+
+
+def apply_transform(
+    data: bytes | bytearray | memoryview,
+    transform: Transform,
+    cache: Optional[dict[bytes, bytes]] = None,
+) -> bytes:
+    # rgb triples, transforms that mix channels need the whole pixel
+    src = bytes(data)
+    if len(src) % 3:
+        raise ValueError(f"expected rgb data, got {len(src)} bytes")
+
+    # previews repeat few colours, each one is only transformed once
+    cache = {} if cache is None else cache
+    out = bytearray(len(src))
+    for i in range(0, len(src), 3):
+        px = src[i : i + 3]
+        mapped = cache.get(px)
+        if mapped is None:
+            rgb = transform(px[0] / 255.0, px[1] / 255.0, px[2] / 255.0)
+            mapped = cache[px] = bytes(to_byte(v) for v in rgb)
+        out[i : i + 3] = mapped
+
+    return bytes(out)
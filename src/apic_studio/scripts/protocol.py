@@ -0,0 +1,12 @@
+import json
+import sys
+from typing import Any, Optional
+
+# c4dpy prints its own output to stdout, protocol lines are tagged
+PROTOCOL_PREFIX = "@@apic "
+
+
+def emit(event: str, job_id: Optional[int] = None, **data: Any):
+    line = json.dumps({"event": event, "id": job_id, **data})
+    sys.stdout.write(f"{PROTOCOL_PREFIX}{line}\n")
+    sys.stdout.flush()
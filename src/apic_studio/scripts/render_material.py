@@ -1,11 +1,14 @@
 import sys
 from argparse import ArgumentParser, Namespace
+from functools import cache
 from pathlib import Path
 from typing import Optional
 
 import c4d
 
 from apic_connector.c4d.services import core
+from colorspace import apply_lut, apply_transform, build_lut
+from protocol import emit
 
 
 def parse_args() -> Namespace:
@@ -37,30 +40,42 @@ def parse_args() -> Namespace:
     return p.parse_args(sys.argv[1:])
 
 
-def bake_linear_to_srgb(bmp: c4d.bitmaps.BaseBitmap):
-    w, h = bmp.GetSize()
+def view_transform() -> tuple[int, bool]:
+    # the view transform comes from ocio and may mix channels, plain srgb doesn't
+    view = getattr(c4d, "COLORSPACETRANSFORMATION_LINEAR_TO_VIEW", None)
+    if view is None:
+        return c4d.COLORSPACETRANSFORMATION_LINEAR_TO_SRGB, True
 
-    mode = getattr(
-        c4d,
-        "COLORSPACETRANSFORMATION_LINEAR_TO_VIEW",
-        c4d.COLORSPACETRANSFORMATION_LINEAR_TO_SRGB,
-    )
-    for y in range(h):
-        for x in range(w):
-            # read raw 0–255 floats as a Vector
-            vec = bmp.GetPixelDirect(x, y)
+    return view, False
+
+
+@cache
+def srgb_lut(mode: int) -> bytes:
+    # srgb works per channel, sampling it once per 8 bit value is exact
+    def transfer(value: float) -> float:
+        return c4d.utils.TransformColor(c4d.Vector(value), mode).x
+
+    return build_lut(transfer)
 
-            # normalize to [0,1]
-            lin = c4d.Vector(vec.x / 255.0, vec.y / 255.0, vec.z / 255.0)
 
-            # apply standard Rec.709→sRGB transfer
-            srgb = c4d.utils.TransformColor(lin, mode)
+def bake_linear_to_srgb(bmp: c4d.bitmaps.BaseBitmap):
+    w, h = bmp.GetSize()
+    mode, per_channel = view_transform()
 
-            r = int(max(0, min(255, srgb.x * 255)))
-            g = int(max(0, min(255, srgb.y * 255)))
-            b = int(max(0, min(255, srgb.z * 255)))
+    def transform(r: float, g: float, b: float) -> tuple[float, float, float]:
+        v = c4d.utils.TransformColor(c4d.Vector(r, g, b), mode)
+        return v.x, v.y, v.z
 
-            bmp.SetPixel(x, y, r, g, b)
+    colors: dict[bytes, bytes] = {}
+    buf = c4d.storage.ByteSeq(None, w * 3)
+    row = memoryview(buf)
+    for y in range(h):
+        bmp.GetPixelCnt(0, y, w, buf, 3, c4d.COLORMODE_RGB, c4d.PIXELCNT_0)
+        if per_channel:
+            row[:] = apply_lut(row, srgb_lut(mode))
+        else:
+            row[:] = apply_transform(row, transform, colors)
+        bmp.SetPixelCnt(0, y, w, buf, 3, c4d.COLORMODE_RGB, c4d.PIXELCNT_0)
 
 
 def render_document_to_file(doc: "c4d.BaseDocument"):
@@ -144,21 +159,39 @@ def main():
     c4d.documents.InsertBaseDocument(doc)
 
     set_render_camera(doc, args.camera)
-    for mat in args.materials.split(","):
+    materials = args.materials.split(",")
+    for idx, mat in enumerate(materials, 1):
         mat_path = Path(mat)
         mat_name = mat_path.stem
         output_path = str(Path(mat_path).parent / f"{mat_name}{args.extension}")
         if not core.import_file(mat):
-            raise RuntimeError(f"Failed to load material file: {mat}")
+            emit("failed", material=mat, error="failed to load material file")
+            continue
 
         set_render_settings(doc, output_path, (args.width, args.height))
         obj = doc.SearchObject(args.object)
         if not obj:
+            emit("failed", material=mat, error=f"render object {args.object} not found")
             continue
-        apply_material(obj, doc.SearchMaterial(mat_name))
-        render_document_to_file(doc)
-
-        obj.KillTag(c4d.TAG_TEXTURE, 0)
+        mtl = doc.SearchMaterial(mat_name)
+        if not mtl:
+            emit("failed", material=mat, error=f"material {mat_name} not found")
+            continue
+        apply_material(obj, mtl)
+        try:
+            render_document_to_file(doc)
+        except RuntimeError as e:
+            emit("failed", material=mat, error=str(e))
+            continue
+        finally:
+            obj.KillTag(c4d.TAG_TEXTURE, 0)
+        emit(
+            "progress",
+            material=mat,
+            output=output_path,
+            index=idx,
+            total=len(materials),
+        )
 
 
 if __name__ == "__main__":
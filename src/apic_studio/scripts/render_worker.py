@@ -0,0 +1,194 @@
+import json
+import os
+import sys
+import traceback
+from pathlib import Path
+from typing import Any, Optional
+
+import c4d
+
+from apic_connector.c4d.services import core
+from protocol import emit
+from render_material import (
+    apply_material,
+    render_document_to_file,
+    set_render_camera,
+    set_render_settings,
+)
+
+
+class SceneCache:
+    def __init__(self) -> None:
+        self.doc: Optional[c4d.documents.BaseDocument] = None
+        self.key: Optional[tuple[str, float, str]] = None
+
+    def get(self, scene: str, camera: str) -> c4d.documents.BaseDocument:
+        key = (scene, os.path.getmtime(scene), camera)
+        if self.doc and self.key == key:
+            return self.doc
+
+        self.close()
+        doc = c4d.documents.LoadDocument(
+            scene, c4d.SCENEFILTER_MATERIALS | c4d.SCENEFILTER_OBJECTS
+        )
+        if not doc:
+            raise RuntimeError(f"Failed to load base scene file: {scene}")
+
+        c4d.documents.InsertBaseDocument(doc)
+        c4d.documents.SetActiveDocument(doc)
+        set_render_camera(doc, camera)
+        print(f"Loaded render scene {scene}")
+
+        self.doc = doc
+        self.key = key
+        return doc
+
+    def close(self):
+        if self.doc:
+            c4d.documents.KillDocument(self.doc)
+        self.doc = None
+        self.key = None
+
+
+def guids(nodes: list[Any]) -> set[int]:
+    return {n.GetGUID() for n in nodes}
+
+
+def remove_new(nodes: list[Any], keep: set[int]):
+    for n in nodes:
+        if n.GetGUID() not in keep:
+            n.Remove()
+
+
+# thread limits that couldn't be applied, reported once per process
+unapplied_threads: set[int] = set()
+
+
+def current_thread_count() -> int:
+    count = getattr(c4d.threading, "GeGetCurrentThreadCount", None)
+    return count() if count else 0
+
+
+def set_render_threads(
+    doc: c4d.documents.BaseDocument, threads: int, job_id: Optional[int] = None
+) -> bool:
+    if threads <= 0:
+        return True
+
+    custom = getattr(c4d, "RDATA_THREADS_CUSTOM", None)
+    count = getattr(c4d, "RDATA_THREADS", None)
+    if custom is not None and count is not None:
+        rd = doc.GetActiveRenderData()
+        rd[custom] = True
+        rd[count] = threads
+        return True
+
+    # otherwise only the -threads flag c4dpy was started with caps the renderer
+    used = current_thread_count()
+    if used and used <= threads:
+        return True
+
+    if threads in unapplied_threads:
+        return False
+
+    unapplied_threads.add(threads)
+    emit(
+        "warning",
+        job_id,
+        message=f"can't limit rendering to {threads} threads, c4d uses {used or 'all'}",
+    )
+    return False
+
+
+def render_material(doc: c4d.documents.BaseDocument, job: dict[str, Any], mat: str):
+    mat_path = Path(mat)
+    mat_name = mat_path.stem
+    output_path = str(mat_path.parent / f"{mat_name}{job.get('extension', '.png')}")
+
+    # everything the material file brings along is removed again so the
+    # cached scene stays identical between renders
+    materials = guids(doc.GetMaterials())
+    objects = guids(doc.GetObjects())
+    try:
+        if not core.import_file(mat):
+            raise RuntimeError(f"Failed to load material file: {mat}")
+
+        set_render_settings(doc, output_path, (job["width"], job["height"]))
+        obj = doc.SearchObject(job["object"])
+        if not obj:
+            raise RuntimeError(f"Render object {job['object']} not found")
+
+        mtl = doc.SearchMaterial(mat_name)
+        if not mtl:
+            raise RuntimeError(f"Material {mat_name} not found in {mat}")
+
+        apply_material(obj, mtl)
+        try:
+            render_document_to_file(doc)
+        finally:
+            obj.KillTag(c4d.TAG_TEXTURE, 0)
+    finally:
+        remove_new(doc.GetMaterials(), materials)
+        remove_new(doc.GetObjects(), objects)
+
+    return output_path
+
+
+def run_render(cache: SceneCache, job: dict[str, Any]):
+    doc = cache.get(job["scene"], job["camera"])
+    set_render_threads(doc, job.get("threads", 0), job["id"])
+    materials = job["materials"]
+    for idx, mat in enumerate(materials, 1):
+        try:
+            output = render_material(doc, job, mat)
+        except Exception as e:
+            emit("failed", job["id"], material=mat, error=str(e))
+            continue
+
+        emit(
+            "progress",
+            job["id"],
+            material=mat,
+            output=output,
+            index=idx,
+            total=len(materials),
+        )
+
+
+def main():
+    c4d.StopAllThreads()
+    cache = SceneCache()
+    emit("ready", pid=os.getpid(), threads=current_thread_count())
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"invalid job: {line}")
+            continue
+
+        kind = job.get("type")
+        if kind == "quit":
+            break
+
+        try:
+            if kind == "render":
+                run_render(cache, job)
+            else:
+                raise ValueError(f"unknown job type: {kind}")
+        except Exception as e:
+            traceback.print_exc()
+            emit("error", job.get("id"), error=str(e))
+            continue
+
+        emit("done", job.get("id"))
+
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,32 @@
 import shutil
 import sys
 from argparse import ArgumentParser, Namespace
+from collections import defaultdict
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import c4d
 import maxon
 
+from protocol import emit
+from texture_store import TextureStore
+
 
 def parse_args() -> Namespace:
     p = ArgumentParser()
     p.add_argument(
-        "--scene", "-s", type=str, help="c4d render scene path", required=True
+        "--scene",
+        "-s",
+        type=str,
+        action="append",
+        default=[],
+        help="c4d scene path, can be passed multiple times",
+    )
+    p.add_argument(
+        "--scene-list",
+        "-sl",
+        type=str,
+        help="text file with one c4d scene path per line",
     )
     p.add_argument(
         "--nocopy",
@@ -19,6 +34,12 @@ def parse_args() -> Namespace:
         help="does not copy textures to local tex folder. default: False",
         action="store_true",
     )
+    p.add_argument(
+        "--texture-store",
+        "-ts",
+        help="deduplicate textures through the pool's shared texture store",
+        action="store_true",
+    )
 
     return p.parse_args(sys.argv[1:])
 
@@ -55,16 +76,29 @@ def get_assets_to_copy(doc: "c4d.BaseDocument", target: Path) -> list[dict[str,
     return filtered
 
 
-def relink_node_asset(item: dict[str, Any], new_path: str):
-    owner = item.get("owner")  # c4d.BaseMaterial
-    if not owner:
-        raise ValueError("No owner found.")
+RS_NODESPACE = "com.redshift3d.redshift4c4d.class.nodespace"
+RS_TEXTURE_PORT = "com.redshift3d.redshift4c4d.nodes.core.texturesampler.tex0"
+
+
+def set_texture_path(node: Any, node_space: str, new_path: str) -> bool:
+    # Redshift TextureSampler → input 'tex0' → child port 'path'
+    if (
+        node_space != RS_NODESPACE
+        or node.GetId().ToString().split("@")[0] != "texturesampler"
+    ):
+        return False
+
+    path_port = node.GetInputs().FindChild(RS_TEXTURE_PORT).FindChild("path")
+    if path_port.IsNullValue():
+        return False
+
+    path_port.SetPortValue(new_path)
+    return True
 
-    node_path = item.get("nodePath", "")  # e.g. 'texturesampler@...'
-    node_space = item.get("nodeSpace", "")
-    if not node_path or not node_space:
-        raise ValueError("No nodeSpace or nodePath found.")
 
+def relink_material(
+    owner: "c4d.BaseMaterial", node_space: str, links: list[tuple[str, str]]
+) -> tuple[int, int]:
     nm = owner.GetNodeMaterialReference()
     if not nm:
         raise ValueError("No node material reference.")
@@ -73,72 +107,206 @@ def relink_node_asset(item: dict[str, Any], new_path: str):
     if graph.IsNullValue():
         raise ValueError("No graph found.")
 
+    relinked = failed = 0
     with graph.BeginTransaction() as tr:
-        node = graph.GetNode(maxon.NodePath(node_path))
-        if node.IsNullValue():
-            raise ValueError("Node is null.")
-        # Redshift TextureSampler → input 'tex0' → child port 'path'
-        if (
-            node_space == "com.redshift3d.redshift4c4d.class.nodespace"
-            and node.GetId().ToString().split("@")[0] == "texturesampler"
-        ):
-            path_port = (
-                node.GetInputs()
-                .FindChild("com.redshift3d.redshift4c4d.nodes.core.texturesampler.tex0")
-                .FindChild("path")
-            )
-            if not path_port.IsNullValue():
-                path_port.SetPortValue(new_path)
+        for node_path, new_path in links:
+            node = graph.GetNode(maxon.NodePath(node_path))
+            if node.IsNullValue() or not set_texture_path(node, node_space, new_path):
+                print(f"Failed to relink {node_path} in {owner.GetName()}")
+                failed += 1
+                continue
+
+            relinked += 1
         tr.Commit()
 
-    print(f"Relinked asset {Path(new_path).name}")
+    return relinked, failed
 
 
-def copy_file(src: Path, dst: Path):
+def copy_file(src: Path, dst: Path) -> bool:
     if not src.exists() or dst.exists():
-        return
+        return False
 
     shutil.copy2(src, dst)
     print(f"Copied {src.name} to {dst}")
+    return True
 
 
-def main():
-    args = parse_args()
+def read_scenes(args: Namespace) -> list[str]:
+    scenes: list[str] = list(args.scene)
+    if args.scene_list:
+        with open(args.scene_list, "r", encoding="utf-8") as f:
+            scenes.extend(line.strip() for line in f if line.strip())
+
+    return scenes
+
+
+def scene_textures(scene: Path) -> set[str]:
+    doc = c4d.documents.LoadDocument(str(scene), c4d.SCENEFILTER_MATERIALS)
+    if not doc:
+        raise RuntimeError(f"Failed to load scene file: {scene}")
+
+    try:
+        assets: list[dict[str, Any]] = []
+        res = c4d.documents.GetAllAssetsNew(
+            doc,
+            allowDialogs=False,
+            lastPath="",
+            flags=c4d.ASSETDATA_FLAG_NONE,
+            assetList=assets,
+        )
+        if res == c4d.GETALLASSETSRESULT_FAILED:
+            raise RuntimeError(f"Failed to gather assets of {scene}")
+        return {a["filename"] for a in assets}
+    finally:
+        c4d.documents.KillDocument(doc)
+
+
+def place_textures(
+    filenames: list[str],
+    tex: Path,
+    nocopy: bool,
+    store: Optional[TextureStore],
+    scene: Path,
+) -> tuple[dict[str, Path], int]:
+    targets: dict[str, Path] = {}
+    copied = 0
+    for filename in filenames:
+        src = Path(filename)
+        dst = tex / src.name
+        if nocopy:
+            pass
+        elif store:
+            dst, stored = store.add(src, dst, scene)
+            copied += stored
+        elif copy_file(src, dst):
+            copied += 1
+
+        targets[filename] = dst
+
+    return targets, copied
+
+
+def repath_scene(
+    scene: str, nocopy: bool, store: Optional[TextureStore] = None
+) -> dict[str, int]:
     doc = c4d.documents.LoadDocument(
-        args.scene, c4d.SCENEFILTER_MATERIALS | c4d.SCENEFILTER_OBJECTS
+        scene, c4d.SCENEFILTER_MATERIALS | c4d.SCENEFILTER_OBJECTS
     )
     if not doc:
-        raise RuntimeError(f"Failed to load base scene file: {args.scene}")
+        raise RuntimeError(f"Failed to load base scene file: {scene}")
 
     c4d.documents.InsertBaseDocument(doc)
-    print(f"Loaded scene {args.scene}")
+    try:
+        print(f"Loaded scene {scene}")
+        return relink_scene(doc, scene, nocopy, store)
+    finally:
+        c4d.documents.KillDocument(doc)
+
 
-    tex = Path(args.scene).parent / "tex"
+def relink_scene(
+    doc: "c4d.BaseDocument",
+    scene: str,
+    nocopy: bool,
+    store: Optional[TextureStore] = None,
+) -> dict[str, int]:
+    tex = Path(scene).parent / "tex"
     tex.mkdir(exist_ok=True)
 
-    while assets := get_assets_to_copy(doc, tex):
+    # gather once, every texture is copied once no matter how often it's used
+    sources: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for asset in get_assets_to_copy(doc, tex):
+        sources[asset["filename"]].append(asset)
+
+    # the store lock is only held to record the placed textures
+    if store:
+        store.load()
+    try:
+        targets, copied = place_textures(
+            list(sources), tex, nocopy, store, Path(scene)
+        )
+    finally:
+        if store:
+            store.commit()
+
+    materials: dict[tuple[Any, str], list[tuple[str, str]]] = defaultdict(list)
+    owners: dict[tuple[Any, str], "c4d.BaseMaterial"] = {}
+    for filename, assets in sources.items():
+        new_asset_path = targets[filename]
         for asset in assets:
-            asset_path = Path(asset["filename"])
-            if asset_path.suffix == ".c4d":
+            owner, node_path = asset.get("owner"), asset.get("nodePath")
+            if not owner or not node_path:
+                print(f"Skipping asset without owner or node path: {filename}")
                 continue
 
-            new_asset_path = tex / asset_path.name
-            if not args.nocopy:
-                copy_file(asset_path, new_asset_path)
+            key = (owner.GetGUID(), asset["nodeSpace"])
+            owners[key] = owner
+            materials[key].append((node_path, str(new_asset_path)))
 
-            try:
-                relink_node_asset(asset, str(new_asset_path))
-            except Exception as e:
-                print(f"Failed to relink asset: {asset}\n{e}")
-                break
+    relinked = failed = 0
+    for key, links in materials.items():
+        try:
+            ok, err = relink_material(owners[key], key[1], links)
+        except Exception as e:
+            print(f"Failed to relink {owners[key].GetName()}: {e}")
+            ok, err = 0, len(links)
+        relinked += ok
+        failed += err
+
+    summary = {
+        "textures": len(sources),
+        "copied": copied,
+        "materials": len(materials),
+        "relinked": relinked,
+        "failed": failed,
+    }
+    print(f"Relinked {scene}: {summary}")
 
     ok = c4d.documents.SaveDocument(
-        doc, args.scene, c4d.SAVEDOCUMENTFLAGS_DONTADDTORECENTLIST, c4d.FORMAT_C4DEXPORT
+        doc, scene, c4d.SAVEDOCUMENTFLAGS_DONTADDTORECENTLIST, c4d.FORMAT_C4DEXPORT
     )
     if not ok:
-        print(f"failed to save document {args.scene}")
+        raise RuntimeError(f"failed to save document {scene}")
 
     print("Document saved")
+    return summary
+
+
+def main():
+    args = parse_args()
+    scenes = read_scenes(args)
+    use_store = args.texture_store and not args.nocopy
+
+    # one c4dpy launch handles every scene, a broken scene doesn't stop the rest
+    for idx, scene in enumerate(scenes, 1):
+        try:
+            store = TextureStore.for_scene(Path(scene)) if use_store else None
+            summary = repath_scene(scene, args.nocopy, store)
+        except Exception as e:
+            emit("failed", scene=scene, error=str(e))
+            continue
+
+        emit(
+            "progress",
+            scene=scene,
+            output=scene,
+            index=idx,
+            total=len(scenes),
+            **summary,
+        )
+
+    if use_store:
+        # textures no asset links to anymore are dropped once per run
+        links: dict[Path, set[str]] = {}
+
+        def cached_links(scene: Path) -> set[str]:
+            if scene not in links:
+                links[scene] = scene_textures(scene)
+            return links[scene]
+
+        for pool in {Path(s).parent.parent for s in scenes}:
+            store = TextureStore(pool)
+            if removed := store.prune(cached_links):
+                print(f"Removed {removed} unused textures from {store.root}")
 
 
 if __name__ == "__main__":
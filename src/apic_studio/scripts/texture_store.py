@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+# kept free of c4d imports, several c4dpy processes share one store
+
+STORE_DIR = ".texstore"
+LOCK_TIMEOUT = 60
+# the holder refreshes its lock, an older one was left behind by a crash
+STALE_LOCK = 120
+HEARTBEAT = STALE_LOCK / 4
+
+# scene -> texture paths the scene links to
+SceneLinks = Callable[[Path], set[str]]
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        # os.kill terminates the process on windows
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            # access denied means the process exists
+            return ctypes.get_last_error() == 5
+
+        code = ctypes.c_ulong()
+        ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return not ok or code.value == 259
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TextureStore:
+    def __init__(self, pool: Path) -> None:
+        self.root = pool / STORE_DIR
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / "lock"
+        self.index: dict[str, Any] = {"objects": {}, "sources": {}}
+        self.owner = f"{socket.gethostname()} {os.getpid()}"
+        # placed since the last commit, merged into the index under the lock
+        self._sources: dict[str, list[Any]] = {}
+        self._refs: list[tuple[str, Path, str, str, Path]] = []
+
+    @classmethod
+    def for_scene(cls, scene: Path) -> "TextureStore":
+        # scenes live in <pool>/<asset>/<asset>.c4d
+        return cls(scene.parent.parent)
+
+    def load(self) -> "TextureStore":
+        # the index is replaced atomically, reading it needs no lock
+        self._load()
+        return self
+
+    def commit(self) -> None:
+        if not self._sources and not self._refs:
+            return
+
+        with self.session():
+            self.index["sources"].update(self._sources)
+            for sha, obj, kind, ref, src in self._refs:
+                if not obj.exists():
+                    # pruned by another process after it was placed
+                    self._store(src, obj)
+                self._add_ref(sha, obj, kind, ref)
+
+        self._sources.clear()
+        self._refs.clear()
+
+    @contextmanager
+    def session(self) -> Iterator["TextureStore"]:
+        # only held to merge into the index, hashing and copying happen outside
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._acquire()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop,), daemon=True)
+        heartbeat.start()
+        try:
+            self._load()
+            yield self
+            self._save()
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.lock_path.unlink(missing_ok=True)
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        while not stop.wait(HEARTBEAT):
+            try:
+                os.utime(self.lock_path)
+            except OSError:
+                return
+
+    def _create_lock(self, owner: str) -> bool:
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        os.write(fd, owner.encode("utf-8"))
+        os.close(fd)
+        return True
+
+    @staticmethod
+    def _is_stale(lock: Path) -> bool:
+        # raises FileNotFoundError once the lock is gone
+        if time.time() - lock.stat().st_mtime > STALE_LOCK:
+            return True
+
+        try:
+            host, pid = lock.read_text(encoding="utf-8").rsplit(" ", 1)
+        except ValueError:
+            # still being written
+            return False
+        return host == socket.gethostname() and not pid_alive(int(pid))
+
+    def _break_lock(self) -> None:
+        # moved aside first, so a lock taken in the meantime isn't deleted
+        stale = self.lock_path.with_name(f"lock.{os.getpid()}.stale")
+        os.replace(self.lock_path, stale)
+        try:
+            if not self._is_stale(stale):
+                self._create_lock(stale.read_text(encoding="utf-8"))
+        finally:
+            stale.unlink(missing_ok=True)
+
+    def _acquire(self) -> None:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self._create_lock(self.owner):
+            try:
+                if self._is_stale(self.lock_path):
+                    self._break_lock()
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"texture store {self.root} is locked")
+            time.sleep(0.1)
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.index["objects"] = data.get("objects", {})
+        self.index["sources"] = data.get("sources", {})
+
+    def _save(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp, self.index_path)
+
+    def hash(self, path: Path) -> str:
+        # sources are only hashed again once they change on disk
+        stat = path.stat()
+        key = str(path.resolve())
+        cached = self.index["sources"].get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+
+        sha = file_sha256(path)
+        self.index["sources"][key] = [stat.st_size, stat.st_mtime_ns, sha]
+        self._sources[key] = self.index["sources"][key]
+        return sha
+
+    def object_path(self, sha: str, suffix: str) -> Path:
+        return self.objects / sha[:2] / f"{sha}{suffix.lower()}"
+
+    def refcount(self, sha: str) -> int:
+        entry = self.index["objects"].get(sha, {})
+        return len(entry.get("refs", [])) + len(entry.get("scenes", []))
+
+    def _add_ref(self, sha: str, obj: Path, kind: str, ref: str) -> None:
+        # refs are hard links, scenes link to the object directly
+        entry = self.index["objects"].setdefault(
+            sha, {"path": str(obj.relative_to(self.root)), "refs": [], "scenes": []}
+        )
+        refs = entry.setdefault(kind, [])
+        if ref not in refs:
+            refs.append(ref)
+
+    def _store(self, src: Path, obj: Path) -> None:
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = obj.with_suffix(f".{os.getpid()}.part")
+        shutil.copy2(src, tmp)
+        os.replace(tmp, obj)
+
+    def _link(self, obj: Path, dst: Path) -> bool:
+        tmp = dst.with_name(f".{dst.name}.link")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(obj, tmp)
+        except OSError:
+            return False
+
+        os.replace(tmp, dst)
+        return True
+
+    def add(self, src: Path, dst: Path, scene: Path) -> tuple[Path, bool]:
+        # runs without the lock, the refs are recorded by commit()
+        if not src.exists():
+            return dst, False
+
+        sha = self.hash(src)
+        obj = self.object_path(sha, src.suffix)
+        stored = False
+        if not obj.exists():
+            self._store(src, obj)
+            stored = True
+            print(f"Stored {src.name} as {obj.name}")
+
+        if dst.exists() and not os.path.samefile(dst, obj):
+            if file_sha256(dst) != sha:
+                return dst, False
+
+        if (dst.exists() and os.path.samefile(dst, obj)) or self._link(obj, dst):
+            self._refs.append((sha, obj, "refs", str(dst), src))
+            return dst, stored
+
+        # no hard links on this file system, the scene references the store
+        self._refs.append((sha, obj, "scenes", str(scene), src))
+        return obj, stored
+
+    @staticmethod
+    def _is_ref(ref: Path, obj: Path) -> bool:
+        try:
+            return os.path.samefile(ref, obj)
+        except OSError:
+            return False
+
+    @staticmethod
+    def _links_to(scene: Path, obj: Path, links: Optional[SceneLinks]) -> bool:
+        if not scene.exists():
+            return False
+        if links is None:
+            return True
+
+        try:
+            paths = links(scene)
+        except Exception as e:
+            # a scene that can't be checked keeps its textures
+            print(f"Failed to read texture links of {scene}: {e}")
+            return True
+
+        target = os.path.normcase(obj.resolve())
+        return any(os.path.normcase(Path(p).resolve()) == target for p in paths)
+
+    def prune(self, links: Optional[SceneLinks] = None) -> int:
+        # refs are checked without the lock, loading scenes takes a while
+        self._load()
+        dead: set[tuple[str, str]] = set()
+        for sha, entry in self.index["objects"].items():
+            obj = self.root / entry["path"]
+            for ref in entry.get("refs", []):
+                if not self._is_ref(Path(ref), obj):
+                    dead.add((sha, ref))
+            for scene in entry.get("scenes", []):
+                if not self._links_to(Path(scene), obj, links):
+                    dead.add((sha, scene))
+
+        # refs added in the meantime aren't in dead and keep their objects
+        removed = 0
+        with self.session():
+            for sha, entry in list(self.index["objects"].items()):
+                obj = self.root / entry["path"]
+                for key in ("refs", "scenes"):
+                    refs = entry.get(key, [])
+                    entry[key] = [r for r in refs if (sha, r) not in dead]
+                if (entry.get("refs") or entry.get("scenes")) and obj.exists():
+                    continue
+
+                obj.unlink(missing_ok=True)
+                del self.index["objects"][sha]
+                removed += 1
+
+        return removed
@@ -1,7 +1,12 @@
 from .asset_loader import AssetConverter, AssetLoader
-from .backup import Backup, BackupManager
-from .dcc import CmdBuilder, DCCBridge, render_material
-from .ping import PingService
+from .backup import AsyncBackup, Backup, BackupIndex, BackupManager
+from .dcc import (
+    AsyncDCCBridge,
+    CmdBuilder,
+    ConnectionState,
+    DCCBridge,
+    render_material,
+)
 from .pools import (
     HdriPoolManager,
     LightsetPoolManager,
@@ -10,22 +15,30 @@ from .pools import (
     PoolManager,
     UtilityPoolManager,
 )
+from .render import RenderPriority, RenderWorkerPool
+from .scene import SceneMirror
 from .screenshot import Screenshot
 
 __all__ = [
     "AssetConverter",
     "AssetLoader",
+    "AsyncDCCBridge",
     "CmdBuilder",
+    "ConnectionState",
     "DCCBridge",
     "render_material",
+    "RenderPriority",
+    "RenderWorkerPool",
     "PoolManager",
     "MaterialPoolManager",
     "ModelPoolManager",
     "LightsetPoolManager",
     "HdriPoolManager",
     "UtilityPoolManager",
+    "SceneMirror",
     "Screenshot",
     "Backup",
     "BackupManager",
-    "PingService",
+    "AsyncBackup",
+    "BackupIndex",
 ]
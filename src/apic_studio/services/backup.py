@@ -1,9 +1,28 @@
+from __future__ import annotations
+
+import json
+import os
 import shutil
+import threading
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
 
+from apic_studio.core.settings import SettingsManager
 from shared.logger import Logger
 
+from .chunk_store import (
+    MANIFEST_SUFFIX,
+    READ_SIZE,
+    STORE_DIR,
+    ChunkStore,
+    Progress,
+)
+
+RESTORED_KEEP = 5
+
 
 @dataclass(slots=True)
 class Backup:
@@ -12,14 +31,88 @@ class Backup:
     path: Path
     version: int
 
+    @property
+    def is_chunked(self) -> bool:
+        return self.path.suffix == MANIFEST_SUFFIX
+
 
 AssetBackups = list[Backup]
 PoolBackups = list[AssetBackups]
 
 
+class BackupCancelled(Exception):
+    pass
+
+
+class BackupIndex:
+    # backup tasks of several scenes write the same pool index
+    _lock = threading.Lock()
+
+    def __init__(self, pool: Path) -> None:
+        self.path = pool / STORE_DIR / "index.json"
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Optional[dict[str, list[int]]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("assets", {})
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            Logger.error(f"failed to read backup index {self.path}: {e}")
+            return None
+
+    def _save(self, assets: dict[str, list[int]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"assets": assets}, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def update(self, asset: str, backups: AssetBackups) -> None:
+        versions = sorted(b.version for b in backups)
+        with self._lock:
+            assets = self.load() or {}
+            if assets.get(asset) == versions:
+                return
+
+            if versions:
+                assets[asset] = versions
+            else:
+                assets.pop(asset, None)
+            self._save(assets)
+
+    def add(self, asset: str, version: int) -> None:
+        with self._lock:
+            assets = self.load() or {}
+            versions = set(assets.get(asset, []))
+            versions.add(version)
+            assets[asset] = sorted(versions)
+            self._save(assets)
+
+    def rename(self, asset: str, new_name: str) -> None:
+        with self._lock:
+            assets = self.load() or {}
+            if asset not in assets:
+                return
+
+            assets[new_name] = assets.pop(asset)
+            self._save(assets)
+
+    def rebuild(self, backups: PoolBackups) -> dict[str, list[int]]:
+        assets = {
+            b[0].path.parent.parent.name: sorted(v.version for v in b) for b in backups
+        }
+        with self._lock:
+            self._save(assets)
+        return assets
+
+
 class BackupManager:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, chunked: Optional[bool] = None) -> None:
+        self.chunked = chunked
 
     def load_from_asset(self, path: Path) -> AssetBackups:
         backup_dir = path / "backups"
@@ -36,6 +129,10 @@ class BackupManager:
 
     def rename_from_asset(self, path: Path, new_name: str) -> AssetBackups:
         backups = self.load_from_asset(path)
+        if backups:
+            old_name = backups[0].path.stem.rsplit("_", 1)[0]
+            BackupIndex(path.parent).rename(old_name, new_name)
+
         for b in backups:
             new_backup = b.path.rename(
                 b.path.parent
@@ -48,30 +145,285 @@ class BackupManager:
     def load_from_pool(self, path: Path) -> PoolBackups:
         return [b for a in path.iterdir() if (b := self.load_from_asset(a))]
 
-    def create(self, path: Path) -> Backup:
+    def index_pool(self, path: Path) -> dict[str, list[int]]:
+        return BackupIndex(path).rebuild(self.load_from_pool(path))
+
+    def next_version(self, path: Path) -> int:
+        versions = [b.version for b in self.load_from_asset(path.parent)]
+        return max(versions, default=0) + 1
+
+    def create(self, path: Path, progress: Optional[Progress] = None) -> Backup:
         backup_dir = path.parent / "backups"
         backup_dir.mkdir(exist_ok=True)
 
-        versions: list[Path] = []
-        for b in backup_dir.iterdir():
-            versions.append(b)
+        next_version = self.next_version(path)
+        name = f"{path.stem}_{self._left_pad(str(next_version), '0')}"
+
+        chunked = self.chunked
+        if chunked is None:
+            chunked = SettingsManager().CoreSettings.chunked_backups
+
+        if chunked:
+            # only chunks the pool hasn't stored yet cost disk space
+            backup_path = backup_dir / f"{name}{MANIFEST_SUFFIX}"
+            manifest, written = ChunkStore.for_asset(path).put(path, progress)
+            ChunkStore.write_manifest(manifest, backup_path)
+            Logger.info(
+                f"created backup {backup_path.name}, "
+                f"stored {written} of {manifest['size']} bytes"
+            )
+        else:
+            backup_path = backup_dir / f"{name}{path.suffix}"
+            self._copy(path, backup_path, progress)
+            Logger.info(f"created backup {backup_path.name}")
+
+        BackupIndex(path.parent.parent).add(path.parent.name, next_version)
+        return Backup(backup_path.stem, path.stem, backup_path, next_version)
+
+    def restore(
+        self, backup: Backup, progress: Optional[Progress] = None
+    ) -> Optional[Path]:
+        if not backup.is_chunked:
+            return backup.path
+
+        manifest = ChunkStore.read_manifest(backup.path)
+        if not manifest:
+            return None
+
+        # restored copies carry the manifest's mtime, an edited copy is restored again
+        suffix = Path(manifest["name"]).suffix
+        dest = backup.path.parent / "restored" / f"{backup.path.stem}{suffix}"
+        stamp = backup.path.stat().st_mtime_ns
+        if dest.exists():
+            cached = dest.stat()
+            if cached.st_size == manifest["size"] and cached.st_mtime_ns == stamp:
+                return dest
 
-        next_version = len(versions) + 1
+        # asset folders live directly in the pool
+        asset_dir = backup.path.parent.parent
+        try:
+            ChunkStore(asset_dir.parent).restore(manifest, dest, progress)
+            os.utime(dest, ns=(stamp, stamp))
+        except (OSError, ValueError) as e:
+            Logger.error(f"failed to restore backup {backup.name}: {e}")
+            return None
 
-        backup_path = (
-            path.parent
-            / "backups"
-            / f"{path.stem}_{self._left_pad(str(next_version), '0')}{path.suffix}"
+        Logger.info(f"restored backup {backup.name}")
+        self._cap_restored(dest)
+        return dest
+
+    def prune(self, pool: Path) -> None:
+        # mark and sweep, chunks no manifest of the pool uses are dropped
+        store = ChunkStore(pool)
+        removed, freed = store.prune()
+        if removed:
+            Logger.info(f"removed {removed} unused backup chunks, freed {freed} bytes")
+        if not store.chunks.exists():
+            return
+
+        for restored in pool.glob("*/backups/restored/*"):
+            manifest = restored.parent.parent / f"{restored.stem}{MANIFEST_SUFFIX}"
+            if restored.suffix == ".part" or manifest.exists():
+                continue
+            try:
+                restored.unlink()
+            except OSError as e:
+                Logger.warning(f"failed to remove restored backup {restored}: {e}")
+
+    def _cap_restored(self, keep: Path) -> None:
+        # restored copies are a cache, only those of the newest backups are kept
+        copies = sorted(
+            (p for p in keep.parent.iterdir() if p != keep and p.suffix != ".part"),
+            key=lambda p: p.stat().st_mtime_ns,
+            reverse=True,
         )
-        shutil.copy2(path, backup_path)
-        backup = Backup(backup_path.stem, path.stem, backup_path, next_version)
+        for p in copies[RESTORED_KEEP - 1 :]:
+            try:
+                p.unlink()
+            except OSError as e:
+                # still open in c4d on windows
+                Logger.warning(f"failed to remove restored backup {p.name}: {e}")
 
-        Logger.info(f"created backup {backup_path.name}")
+    def _copy(self, src: Path, dst: Path, progress: Optional[Progress]) -> None:
+        part = dst.with_name(dst.name + ".part")
+        total = src.stat().st_size
+        done = 0
+        try:
+            with open(src, "rb") as fsrc, open(part, "wb") as fdst:
+                while block := fsrc.read(READ_SIZE):
+                    fdst.write(block)
+                    done += len(block)
+                    if progress:
+                        progress(done, total)
 
-        return backup
+            shutil.copystat(src, part)
+            os.replace(part, dst)
+        finally:
+            part.unlink(missing_ok=True)
 
     def _left_pad(self, value: str, pad_value: str, pad: int = 3) -> str:
         if len(value) > pad:
             return value
 
         return f"{pad_value * (pad - len(value))}{value}"
+
+
+class BackupTask(QRunnable):
+    def __init__(self, manager: BackupManager, path: Path, notifier: AsyncBackup):
+        super().__init__()
+        self.manager = manager
+        self.path = path
+        self.notifier = notifier
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def _on_progress(self, done: int, total: int):
+        if not self._running:
+            raise BackupCancelled(self.path)
+
+        # percent, byte counts of large scenes overflow qt's int
+        self.notifier.progress.emit(self.path, done * 100 // total if total else 100)
+
+    def run(self):
+        try:
+            # cancelled while it was still queued
+            self._on_progress(0, 1)
+            backup = self.manager.create(self.path, self._on_progress)
+        except BackupCancelled:
+            Logger.info(f"cancelled backup of {self.path.name}")
+            self.notifier.cancelled.emit(self.path)
+        except Exception as e:
+            Logger.exception(e)
+            self.notifier.failed.emit(self.path)
+        else:
+            self.notifier.finished.emit(self.path, backup)
+
+        # an aborted backup leaves chunks behind that no manifest uses
+        prune_pool(self.manager, self.path.parent.parent)
+
+
+def prune_pool(manager: BackupManager, pool: Path) -> None:
+    try:
+        manager.prune(pool)
+    except Exception as e:
+        Logger.exception(e)
+
+
+class PruneTask(QRunnable):
+    def __init__(self, manager: BackupManager, pool: Path):
+        super().__init__()
+        self.manager = manager
+        self.pool = pool
+
+    def run(self):
+        prune_pool(self.manager, self.pool)
+
+
+class RestoreTask(QRunnable):
+    def __init__(self, manager: BackupManager, backup: Backup, notifier: AsyncBackup):
+        super().__init__()
+        self.manager = manager
+        self.backup = backup
+        self.notifier = notifier
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def _on_progress(self, done: int, total: int):
+        if not self._running:
+            raise BackupCancelled(self.backup.path)
+
+        percent = done * 100 // total if total else 100
+        self.notifier.restore_progress.emit(self.backup.path, percent)
+
+    def run(self):
+        try:
+            path = self.manager.restore(self.backup, self._on_progress)
+        except BackupCancelled:
+            Logger.info(f"cancelled restoring {self.backup.name}")
+            path = None
+        except Exception as e:
+            Logger.exception(e)
+            path = None
+
+        self.notifier.restored.emit(self.backup.path, path)
+
+
+class BackupIndexTask(QRunnable):
+    def __init__(self, manager: BackupManager, pool: Path, notifier: AsyncBackup):
+        super().__init__()
+        self.manager = manager
+        self.pool = pool
+        self.notifier = notifier
+
+    def run(self):
+        try:
+            assets = self.manager.index_pool(self.pool)
+        except Exception as e:
+            Logger.exception(e)
+            assets = {}
+
+        Logger.info(f"indexed {len(assets)} assets with backups in {self.pool}")
+        self.notifier.indexed.emit(self.pool, assets)
+
+
+class AsyncBackup(QObject):
+    progress = Signal(Path, int)
+    finished = Signal(Path, object)
+    cancelled = Signal(Path)
+    failed = Signal(Path)
+    indexed = Signal(Path, object)
+    restore_progress = Signal(Path, int)
+    restored = Signal(Path, object)
+
+    def __init__(
+        self,
+        manager: Optional[BackupManager] = None,
+        parent: Optional[QObject] = None,
+    ):
+        super().__init__(parent)
+        self.manager = manager or BackupManager()
+        self._pool = QThreadPool.globalInstance()
+        self._tasks: dict[Path, BackupTask] = {}
+
+        self.finished.connect(lambda path, _: self._tasks.pop(path, None))
+        self.cancelled.connect(lambda path: self._tasks.pop(path, None))
+        self.failed.connect(lambda path: self._tasks.pop(path, None))
+
+    def create(self, path: Path) -> Optional[BackupTask]:
+        # two backups of one scene would race for the same version
+        if path in self._tasks:
+            Logger.warning(f"backup of {path.name} is already running")
+            return None
+
+        task = BackupTask(self.manager, path, self)
+        self._tasks[path] = task
+        self._pool.start(task)  # type: ignore
+        return task
+
+    def cancel(self, path: Path):
+        if task := self._tasks.get(path):
+            task.stop()
+
+    def is_running(self, path: Path) -> bool:
+        return path in self._tasks
+
+    def index_pool(self, pool: Path) -> BackupIndexTask:
+        # scanning every asset folder is slow on network pools
+        task = BackupIndexTask(self.manager, pool, self)
+        self._pool.start(task)  # type: ignore
+        return task
+
+    def restore(self, backup: Backup) -> RestoreTask:
+        # chunked backups are rebuilt from the pool's chunk store first
+        task = RestoreTask(self.manager, backup, self)
+        self._pool.start(task)  # type: ignore
+        return task
+
+    def prune(self, pool: Path) -> PruneTask:
+        task = PruneTask(self.manager, pool)
+        self._pool.start(task)  # type: ignore
+        return task
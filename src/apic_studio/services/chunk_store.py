@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import rust_thumbnails
+
+from shared.logger import Logger
+
+# builds of the extension from before the chunker fall back to python
+cdc_chunks = getattr(rust_thumbnails, "cdc_chunks", None)
+
+STORE_DIR = ".backups"
+MANIFEST_SUFFIX = ".apicbak"
+MANIFEST_VERSION = 1
+
+MIN_CHUNK = 256 * 1024
+AVG_CHUNK = 1024 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+READ_SIZE = 4 * 1024 * 1024
+GEAR_SEED = 0x61706963_73747564
+# chunks of a backup are written before its manifest, young chunks are kept
+PRUNE_GRACE = 60 * 60
+
+U64 = (1 << 64) - 1
+
+Chunk = tuple[int, int]
+# bytes done, bytes total, raising from it aborts the operation
+Progress = Callable[[int, int], None]
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(READ_SIZE):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def _splitmix64(state: int) -> tuple[int, int]:
+    state = (state + 0x9E3779B97F4A7C15) & U64
+    z = state
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & U64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & U64
+    return state, z ^ (z >> 31)
+
+
+def _gear_table() -> list[int]:
+    # must match the table of the rust chunker, chunk ids depend on it
+    table: list[int] = []
+    state = GEAR_SEED
+    for _ in range(256):
+        state, value = _splitmix64(state)
+        table.append(value)
+    return table
+
+
+GEAR = _gear_table()
+
+
+def chunk_mask(avg_size: int) -> int:
+    bits = avg_size.bit_length() - 1
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def _py_chunks(
+    path: Path,
+    min_size: int,
+    avg_size: int,
+    max_size: int,
+    progress: Optional[Progress] = None,
+) -> list[Chunk]:
+    gear, mask = GEAR, chunk_mask(avg_size)
+    chunks: list[Chunk] = []
+    start = length = h = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while block := f.read(READ_SIZE):
+            if progress:
+                progress(f.tell(), size)
+
+            i, n = 0, len(block)
+            while i < n:
+                # bytes below the minimum chunk size can't end a chunk
+                if length < min_size - 1:
+                    skip = min(min_size - 1 - length, n - i)
+                    length += skip
+                    i += skip
+                    continue
+
+                h = ((h << 1) + gear[block[i]]) & U64
+                i += 1
+                length += 1
+                if not h & mask or length >= max_size:
+                    chunks.append((start, length))
+                    start += length
+                    length = h = 0
+
+    if length:
+        chunks.append((start, length))
+    return chunks
+
+
+def chunk_file(
+    path: Path,
+    min_size: int = MIN_CHUNK,
+    avg_size: int = AVG_CHUNK,
+    max_size: int = MAX_CHUNK,
+    progress: Optional[Progress] = None,
+) -> list[Chunk]:
+    # content defined chunks, an edit only changes the chunks around it
+    if cdc_chunks is not None:
+        return cdc_chunks(str(path), min_size, avg_size, max_size, progress)
+
+    return _py_chunks(path, min_size, avg_size, max_size, progress)
+
+
+class ChunkStore:
+    def __init__(self, pool: Path) -> None:
+        self.root = pool / STORE_DIR
+        self.chunks = self.root / "chunks"
+
+    @classmethod
+    def for_asset(cls, path: Path) -> "ChunkStore":
+        # assets live in <pool>/<asset>/<asset>.c4d
+        return cls(path.parent.parent)
+
+    def chunk_path(self, chunk_id: str) -> Path:
+        return self.chunks / chunk_id[:2] / chunk_id
+
+    def _read_chunks(
+        self, path: Path, progress: Optional[Progress] = None
+    ) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            for offset, length in chunk_file(path, progress=progress):
+                f.seek(offset)
+                yield f.read(length)
+
+    def put(
+        self, path: Path, progress: Optional[Progress] = None
+    ) -> tuple[dict[str, Any], int]:
+        digest = hashlib.sha256()
+        chunks: list[list[Any]] = []
+        total = path.stat().st_size
+        done = written = 0
+
+        # the file is read twice, to find the chunks and to store them
+        def chunking(read: int, _: int) -> None:
+            if progress:
+                progress(read, 2 * total)
+
+        for data in self._read_chunks(path, chunking):
+            digest.update(data)
+            done += len(data)
+            if progress:
+                progress(total + done, 2 * total)
+
+            chunk_id = hashlib.sha256(data).hexdigest()
+            chunks.append([chunk_id, len(data)])
+
+            target = self.chunk_path(chunk_id)
+            if target.exists():
+                # a reused chunk counts as young again, prune keeps it
+                os.utime(target)
+                continue
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f".{os.getpid()}.part")
+            tmp.write_bytes(zlib.compress(data, 1))
+            os.replace(tmp, target)
+            written += len(data)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": path.name,
+            "size": sum(c[1] for c in chunks),
+            "sha256": digest.hexdigest(),
+            "chunks": chunks,
+        }
+        return manifest, written
+
+    def restore(
+        self,
+        manifest: dict[str, Any],
+        dest: Path,
+        progress: Optional[Progress] = None,
+    ) -> Path:
+        part = dest.with_name(dest.name + ".part")
+        digest = hashlib.sha256()
+        done = 0
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(part, "wb") as f:
+                for chunk_id, length in manifest["chunks"]:
+                    data = zlib.decompress(self.chunk_path(chunk_id).read_bytes())
+                    if len(data) != length:
+                        raise ValueError(f"chunk {chunk_id} is corrupt")
+                    digest.update(data)
+                    f.write(data)
+                    done += length
+                    if progress:
+                        progress(done, manifest["size"])
+
+            if digest.hexdigest() != manifest["sha256"]:
+                raise ValueError(f"restored {dest.name} doesn't match its backup")
+            os.replace(part, dest)
+        finally:
+            part.unlink(missing_ok=True)
+
+        return dest
+
+    def manifests(self) -> Iterator[Path]:
+        # manifests live in <pool>/<asset>/backups
+        return self.root.parent.glob(f"*/backups/*{MANIFEST_SUFFIX}")
+
+    def prune(self) -> tuple[int, int]:
+        if not self.chunks.exists():
+            return 0, 0
+
+        live: set[str] = set()
+        for path in self.manifests():
+            manifest = self.read_manifest(path)
+            if manifest is None:
+                # any chunk could belong to a manifest that can't be read
+                return 0, 0
+            live.update(chunk_id for chunk_id, _ in manifest["chunks"])
+
+        cutoff = time.time() - PRUNE_GRACE
+        removed = freed = 0
+        for chunk in self.chunks.glob("*/*"):
+            if chunk.name in live:
+                continue
+            try:
+                stat = chunk.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                chunk.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += stat.st_size
+
+        return removed, freed
+
+    @staticmethod
+    def write_manifest(manifest: dict[str, Any], path: Path) -> None:
+        tmp = path.with_name(path.name + ".part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_manifest(path: Path) -> Optional[dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            Logger.error(f"failed to read backup manifest {path}: {e}")
+            return None
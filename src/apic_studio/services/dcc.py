@@ -1,15 +1,38 @@
+import json
+import os
+import random
 import subprocess
 import sys
+import tempfile
+import time
+from collections import deque
+from enum import StrEnum
+from functools import partial
+from itertools import count
 from pathlib import Path
+from queue import Empty, Queue
 from subprocess import Popen
-from typing import Any, Callable, Optional, Protocol
+from threading import Lock, Thread
+from typing import Any, Callable, NamedTuple, Optional, Protocol
 
-from PySide6.QtCore import QObject, QThread
+from PySide6.QtCore import QObject, QThread, Signal
 
 from apic_studio.core.settings import SettingsManager
+from apic_studio.services.render import (
+    PROTOCOL_PREFIX,
+    PreviewProgress,
+    RenderPriority,
+    RenderWorkerPool,
+    Watchdog,
+    find_script,
+    render_timeout,
+)
 from shared.logger import Logger
-from shared.messaging import Message
-from shared.network import Connection
+from shared.messaging import BATCH_MESSAGE, Message, metrics
+from shared.messaging.metrics import ROUND_TRIP
+from shared.network import Connection, TransferClient
+
+REPATH_PROCESSES = 4
 
 
 class CmdBuilder:
@@ -50,17 +73,23 @@ class Cinema4D:
         self._renders: list[RenderThread] = []
 
     @property
-    def default_location(self) -> Path:
-        return self.default_locations[self.platform]
+    def default_location(self) -> Optional[Path]:
+        # there is no default install location on linux
+        return self.default_locations.get(self.platform)
 
-    def _get_base(self) -> Path:
-        loc = self.install_location or self.default_location
-        res = list(loc.glob("Maxon Cinema 4D*"))
-        latest = res[-1]
-        return latest
+    def _get_base(self) -> Optional[Path]:
+        versions = self.get_versions()
+        if not versions:
+            Logger.error(f"no Cinema 4D installation found on {self.platform}")
+            return None
+
+        return versions[-1]
 
     def get_versions(self) -> list[Path]:
         loc = self.install_location or self.default_location
+        if not loc:
+            return []
+
         return list(loc.glob("Maxon Cinema 4D*"))
 
     def _get_version_base(self, version: str) -> Optional[Path]:
@@ -77,7 +106,8 @@ class Cinema4D:
     def get_exe(self, version: Optional[str] = None) -> Optional[Path]:
         exe = "Cinema 4D.exe"
         if not version:
-            return self._get_base() / exe
+            base = self._get_base()
+            return base / exe if base else None
 
         if v := self._get_version_base(version):
             return v / exe
@@ -85,7 +115,8 @@ class Cinema4D:
     def get_batch(self, version: Optional[str] = None) -> Optional[Path]:
         exe = "Commandline.exe"
         if not version:
-            return self._get_base() / exe
+            base = self._get_base()
+            return base / exe if base else None
 
         if v := self._get_version_base(version):
             return v / exe
@@ -93,7 +124,8 @@ class Cinema4D:
     def get_py(self, version: Optional[str] = None) -> Optional[Path]:
         exe = "c4dpy.exe"
         if not version:
-            return self._get_base() / exe
+            base = self._get_base()
+            return base / exe if base else None
 
         if v := self._get_version_base(version):
             return v / exe
@@ -101,16 +133,23 @@ class Cinema4D:
     def run_exe(self, args: list[str]) -> None:
         raise NotImplementedError()
 
-    def run_py(self, args: list[str], callback: Optional[Callable[[], None]] = None):
+    def run_py(
+        self,
+        args: list[str],
+        callback: Optional[Callable[[], None]] = None,
+        progress: Optional[PreviewProgress] = None,
+    ):
         cmd = f"{self.get_py()} {' '.join(args)}"
-        rt = RenderThread(cmd)
+        rt = RenderThread(cmd, render_timeout())
         self._renders.append(rt)
+        if progress:
+            rt.progress.connect(progress)
 
         def on_finished():
             if callback:
                 Logger.info("Finished c4dpy process")
                 callback()
-            self._renders.clear()
+            self._renders.remove(rt)
             rt.deleteLater()
 
         rt.finished.connect(on_finished)
@@ -123,46 +162,174 @@ class Cinema4D:
 
     def versions(self) -> list[Path]:
         loc = self.default_location
+        if not loc:
+            return []
+
         return list(loc.glob("Maxon Cinema 4D*"))
 
 
 class RenderThread(QThread):
+    progress = Signal(str, int, int)
+    failed = Signal(str)
+
     def __init__(
         self,
         cmd: str,
+        timeout: float = 0,
         parent: QObject | None = None,
     ) -> None:
         super().__init__(parent)
         self.cmd = cmd
+        self.timeout = timeout
+        self.pid = 0
 
     def run(self):
-        with Popen(self.cmd) as p:
-            # out, err = p.communicate()
-            # try:
-            #     Logger.debug(out.decode(errors="ignore"))
-            #     Logger.debug(err.decode(errors="ignore"))
-            # except UnicodeEncodeError:
-            #     pass
-            p.wait()
+        try:
+            p = Popen(
+                self.cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                bufsize=1,
+            )
+        except OSError as e:
+            Logger.error(f"failed to start c4dpy: {e}")
+            self.failed.emit(str(e))
+            return
+
+        self.pid = p.pid
+        watchdog = Watchdog(self.timeout, p.kill)
+        lines: Queue[tuple[str, Optional[str]]] = Queue()
+        for name, stream in (("stdout", p.stdout), ("stderr", p.stderr)):
+            Thread(target=self._read, args=(name, stream, lines), daemon=True).start()
+
+        # both readers put None once their pipe closes, including after a kill
+        watchdog.start()
+        open_streams = 2
+        while open_streams:
+            name, line = lines.get()
+            if line is None:
+                open_streams -= 1
+                continue
+
+            watchdog.feed()
+            self._handle_line(name, line)
+
+        watchdog.stop()
+        code = p.wait()
+        if watchdog.expired:
+            msg = f"c4dpy {self.pid} was silent for {self.timeout}s and was killed"
+        elif code != 0:
+            msg = f"c4dpy {self.pid} exited with code {code}"
+        else:
+            return
+
+        Logger.error(msg)
+        self.failed.emit(msg)
+
+    @staticmethod
+    def _read(name: str, stream: Any, lines: Queue[tuple[str, Optional[str]]]):
+        try:
+            for line in stream:
+                lines.put((name, line.rstrip()))
+        finally:
+            stream.close()
+            lines.put((name, None))
+
+    def _handle_line(self, stream: str, line: str):
+        if stream == "stderr":
+            Logger.warning(f"[c4dpy {self.pid}] {line}")
+            return
+
+        if not line.startswith(PROTOCOL_PREFIX):
+            Logger.debug(f"[c4dpy {self.pid}] {line}")
+            return
+
+        try:
+            event = json.loads(line[len(PROTOCOL_PREFIX) :])
+        except json.JSONDecodeError:
+            Logger.error(f"c4dpy {self.pid} sent invalid data: {line}")
+            return
+
+        match event.get("event"):
+            case "progress":
+                self.progress.emit(
+                    event.get("output", ""),
+                    event.get("index", 0),
+                    event.get("total", 0),
+                )
+            case "failed":
+                item = event.get("material") or event.get("scene")
+                Logger.error(f"c4dpy failed on {item}: {event.get('error')}")
 
 
 class DCCBridge:
-    def __init__(self, ctx: Connection) -> None:
+    BUSY_RETRIES = 3
+    # saving, exporting and batches can take minutes on large scenes
+    LONG_TIMEOUT = 300.0
+
+    def __init__(
+        self, ctx: Connection, render_pool: Optional[RenderWorkerPool] = None
+    ) -> None:
         self.ctx = ctx
+        self.render_pool = render_pool
 
     def is_err(self, msg: Message) -> bool:
-        if msg.message == "error":
+        if msg.message in ("error", "busy"):
             return True
 
         return False
 
-    def call(self, message: str, data: Optional[Any] = None) -> Message:
+    def _send_recv(self, msg: Message, timeout: Optional[float] = None) -> Message:
+        start = time.perf_counter()
+        with self.ctx.request_timeout(timeout):
+            res = Message.from_dict(self.ctx.send_recv(msg))
+        elapsed = (time.perf_counter() - start) * 1000
+        metrics.observe(msg.message, ROUND_TRIP, elapsed)
+        return res
+
+    def call(
+        self,
+        message: str,
+        data: Optional[Any] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
         msg = Message(message, data=data)
-        res = self.ctx.send_recv(msg)
-        return Message.from_dict(res)
+        res = self._send_recv(msg, timeout)
+
+        retries = 0
+        while res.message == "busy" and retries < self.BUSY_RETRIES:
+            retries += 1
+            retry_after = (res.data or {}).get("retry_after", 0.5)
+            Logger.warning(
+                f"connector is busy, retrying {message} in {retry_after}s ({retries}/{self.BUSY_RETRIES})"
+            )
+            time.sleep(retry_after * retries)
+            res = self._send_recv(msg, timeout)
 
-    def connect(self, address: tuple[str, int]) -> None:
-        self.ctx.connect(address)
+        return res
+
+    def batch(self, messages: list[Message]) -> list[Message]:
+        if not messages:
+            return []
+
+        res = self.call(
+            BATCH_MESSAGE, [m.as_dict() for m in messages], self.LONG_TIMEOUT
+        )
+        if self.is_err(res) or not isinstance(res.data, list):
+            Logger.error(f"failed to run batch of {len(messages)} messages: {res}")
+            return [res for _ in messages]
+
+        results = [Message.from_dict(r) for r in res.data]
+        for msg, r in zip(messages, results):
+            if self.is_err(r):
+                Logger.error(f"batched {msg.message} failed: {r}")
+
+        return results
+
+    def connect(self, address: tuple[str, int], quiet: bool = False) -> None:
+        self.ctx.connect(address, quiet)
 
     def on_connect(self, fn: Callable[[], None]) -> None:
         self.ctx.on_connect(fn)
@@ -170,12 +337,16 @@ class DCCBridge:
     def on_disconnect(self, fn: Callable[[], None]) -> None:
         self.ctx.on_disconnect(fn)
 
+    def on_event(self, fn: Callable[[Message], None]) -> None:
+        self.ctx.on_event(fn)
+
     def models_export_selected(
         self, path: Path, globalize_textures: bool = False
     ) -> Message:
         res = self.call(
             "models.export.selected",
             {"path": str(path), "globalize_textures": globalize_textures},
+            self.LONG_TIMEOUT,
         )
         if self.is_err(res):
             Logger.error(f"failed to export asset: {path.name} to {path}: {res}")
@@ -195,10 +366,19 @@ class DCCBridge:
 
         return res
 
+    def models_import_all(self, paths: list[Path]) -> list[Message]:
+        return self.batch([Message("models.import", {"path": str(p)}) for p in paths])
+
+    def models_reference_all(self, paths: list[Path]) -> list[Message]:
+        return self.batch(
+            [Message("models.reference", {"path": str(p)}) for p in paths]
+        )
+
     def save_as(self, path: Path, globalize_textures: bool = False) -> Message:
         res = self.call(
             "core.file.save_as",
             {"path": str(path), "globalize_textures": globalize_textures},
+            self.LONG_TIMEOUT,
         )
         if self.is_err(res):
             Logger.error(f"failed to save as: {path.name} to {path}: {res}")
@@ -222,6 +402,7 @@ class DCCBridge:
                 "path": str(path),
                 "globalize_textures": globalize_tetxures,
             },
+            timeout=self.LONG_TIMEOUT,
         )
         if self.is_err(res):
             Logger.error(f"failed to export materials: {res}")
@@ -235,15 +416,50 @@ class DCCBridge:
 
         return res
 
+    def materials_import_all(self, paths: list[Path]) -> list[Message]:
+        return self.batch(
+            [Message("materials.import", {"path": str(p)}) for p in paths]
+        )
+
     def materials_preview_create(
-        self, path: Path, callback: Optional[Callable[[], None]] = None
-    ):
-        render_material([path], callback=callback)
+        self,
+        path: Path,
+        callback: Optional[Callable[[], None]] = None,
+        progress: Optional[PreviewProgress] = None,
+    ) -> Optional[int]:
+        return self.materials_preview_create_all(
+            [path],
+            callback=callback,
+            priority=RenderPriority.INTERACTIVE,
+            force=True,
+            progress=progress,
+        )
 
     def materials_preview_create_all(
-        self, path: list[Path], callback: Optional[Callable[[], None]] = None
-    ):
-        render_material(path, callback=callback)
+        self,
+        path: list[Path],
+        callback: Optional[Callable[[], None]] = None,
+        priority: RenderPriority = RenderPriority.BATCH,
+        force: bool = False,
+        progress: Optional[PreviewProgress] = None,
+    ) -> Optional[int]:
+        if not path:
+            return None
+
+        # the pool workers skip previews that are up to date
+        if self.render_pool:
+            job_id = self.render_pool.submit(path, callback, priority, force)
+            if job_id is not None:
+                return job_id
+
+        render_material(path, callback=callback, progress=progress)
+        return None
+
+    def materials_preview_cancel(self, job_id: int) -> bool:
+        if not self.render_pool:
+            return False
+
+        return self.render_pool.cancel(job_id)
 
     def hdri_import_as_dome(self, path: Path) -> Message:
         res = self.call("hdris.import.domelight", {"path": str(path)})
@@ -260,12 +476,49 @@ class DCCBridge:
         return res
 
     def file_open(self, path: Path) -> Message:
-        res = self.call("core.file.open", {"path": str(path)})
+        res = self.call("core.file.open", {"path": str(path)}, self.LONG_TIMEOUT)
         if self.is_err(res):
             Logger.error(f"failed to open file: {path.name}: {res}")
 
         return res
 
+    def upload(self, path: Path) -> Message:
+        with self.ctx.request_timeout(self.LONG_TIMEOUT):
+            remote_path = TransferClient(self.ctx).upload(path)
+        if not remote_path:
+            return Message("error", f"failed to upload {path.name}")
+
+        return Message("transfer", {"path": remote_path})
+
+    def download(self, remote_path: str, dest: Path) -> Message:
+        with self.ctx.request_timeout(self.LONG_TIMEOUT):
+            ok = TransferClient(self.ctx).download(remote_path, dest)
+        if not ok:
+            return Message("error", f"failed to download {remote_path}")
+
+        return Message("transfer", {"path": str(dest)})
+
+    def scene_subscribe(self) -> Message:
+        res = self.call("scene.subscribe")
+        if self.is_err(res):
+            Logger.error(f"failed to subscribe to scene events: {res}")
+
+        return res
+
+    def scene_snapshot(self) -> Message:
+        res = self.call("scene.snapshot")
+        if self.is_err(res):
+            Logger.error(f"failed to get scene snapshot: {res}")
+
+        return res
+
+    def core_metrics(self, reset: bool = False) -> Message:
+        res = self.call("core.metrics", {"reset": reset})
+        if self.is_err(res):
+            Logger.error(f"failed to fetch connector metrics: {res}")
+
+        return res
+
     def repath_textures(
         self,
         path: Path,
@@ -277,37 +530,478 @@ class DCCBridge:
     def batch_repath_textures(
         self, paths: list[Path], callback: Optional[Callable[[], None]] = None
     ):
-        def _seq_repath():
+        repath_textures_batch(paths, callback=callback)
+
+
+DCCCallback = Callable[[Message], None]
+DCCBatchCallback = Callable[[list[Message]], None]
+DCCTask = Callable[[], Any]
+
+
+class ConnectionState(StrEnum):
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+    DISCONNECTED = "disconnected"
+
+
+class DCCTaskItem(NamedTuple):
+    task_id: int
+    task: DCCTask
+    idempotent: bool = False
+    requires_connection: bool = True
+
+
+class Backoff:
+    def __init__(
+        self,
+        initial: float = 0.5,
+        maximum: float = 5.0,
+        factor: float = 2.0,
+        jitter: float = 0.2,
+        max_attempts: int = 8,
+    ) -> None:
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.attempts = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+    def next_delay(self) -> float:
+        delay = min(self.maximum, self.initial * self.factor**self.attempts)
+        self.attempts += 1
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+
+class DCCWorker(QObject):
+    response = Signal(int, object)
+    state_changed = Signal(str)
+    event = Signal(object)
+
+    MAX_REPLAY = 32
+    HEARTBEAT_INTERVAL = 5.0
+    HEARTBEAT_TIMEOUT = 2.0
+    EVENT_POLL_INTERVAL = 0.25
+
+    def __init__(self, bridge: DCCBridge, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.bridge = bridge
+        self.task_queue: Queue[Optional[DCCTaskItem]] = Queue()
+        self.replay: deque[DCCTaskItem] = deque()
+        self.backoff = Backoff()
+        self.address: Optional[tuple[str, int]] = None
+        self.state = ConnectionState.DISCONNECTED
+        self._next_attempt = 0.0
+        self._last_activity = time.monotonic()
+        self._running = True
+        self.bridge.on_event(self.event.emit)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.bridge.ctx.is_connected
+
+    def add_task(self, item: DCCTaskItem) -> None:
+        self.task_queue.put(item)
+
+    def wake(self) -> None:
+        self.task_queue.put(None)
+
+    def stop(self) -> None:
+        self._running = False
+        self.wake()
+
+    def run(self) -> None:
+        while self._running:
             try:
-                p = paths.pop()
-            except IndexError:
-                return
+                item = self.task_queue.get(timeout=self._wait_timeout())
+            except Empty:
+                item = None
+
+            if not self._running:
+                break
+
+            if self._should_reconnect():
+                self._reconnect()
+
+            if item:
+                self._execute(item)
+            elif self._should_heartbeat():
+                self._heartbeat()
+            elif self.is_connected:
+                self._poll_events()
+
+    def connect(self, address: tuple[str, int]) -> None:
+        self.address = address
+        self.backoff.reset()
+        self._reconnect(quiet=False)
+
+    def _set_state(self, state: ConnectionState) -> None:
+        if state == self.state:
+            return
+
+        self.state = state
+        self.state_changed.emit(str(state))
+
+    def _wait_timeout(self) -> Optional[float]:
+        if self.address is None:
+            return None
+
+        if self.is_connected:
+            next_heartbeat = self._last_activity + self.HEARTBEAT_INTERVAL
+            timeout = min(next_heartbeat - time.monotonic(), self.EVENT_POLL_INTERVAL)
+            return max(0.0, timeout)
+
+        return max(0.0, self._next_attempt - time.monotonic())
+
+    def _should_heartbeat(self) -> bool:
+        idle = time.monotonic() - self._last_activity
+        return self.is_connected and idle >= self.HEARTBEAT_INTERVAL
+
+    def _heartbeat(self) -> None:
+        self._last_activity = time.monotonic()
+        if self.bridge.ctx.heartbeat(self.HEARTBEAT_TIMEOUT):
+            return
 
-            if not p:
+        Logger.error("apic studio connector stopped answering heartbeats")
+        self._on_connection_lost()
+
+    def _poll_events(self) -> None:
+        # pushed events that arrive between requests are read here, the ones
+        # that arrive during a request are dispatched by recv()
+        try:
+            self.bridge.ctx.poll()
+        except TimeoutError:
+            # the rest of a partly received frame is read on the next poll
+            pass
+        except OSError as e:
+            Logger.error(f"connection to apic studio connector failed: {e}")
+            self._on_connection_lost()
+
+    def _should_reconnect(self) -> bool:
+        return (
+            self.address is not None
+            and not self.is_connected
+            and time.monotonic() >= self._next_attempt
+        )
+
+    def _reconnect(self, quiet: bool = True) -> None:
+        if not self.address:
+            return
+
+        # once disconnected the connector is probed quietly in the background
+        if self.state != ConnectionState.DISCONNECTED:
+            self._set_state(ConnectionState.RECONNECTING)
+
+        self.bridge.connect(self.address, quiet=quiet)
+        if self.is_connected:
+            self.backoff.reset()
+            self._set_state(ConnectionState.CONNECTED)
+            self._replay()
+            return
+
+        if not quiet or self.backoff.exhausted:
+            self._give_up()
+
+        delay = self.backoff.next_delay()
+        self._next_attempt = time.monotonic() + delay
+        Logger.debug(f"reconnecting to apic studio connector in {delay:.1f}s")
+
+    def _on_connection_lost(self) -> None:
+        was_connected = self.is_connected
+        self.bridge.ctx.close()
+        if was_connected:
+            self.bridge.ctx._disconnect()  # type: ignore
+
+        self._next_attempt = time.monotonic()
+        self._set_state(ConnectionState.RECONNECTING)
+
+    def _give_up(self) -> None:
+        self._set_state(ConnectionState.DISCONNECTED)
+        while self.replay:
+            item = self.replay.popleft()
+            msg = Message("error", "not connected to apic studio connector")
+            self.response.emit(item.task_id, msg)
+
+    def _defer(self, item: DCCTaskItem) -> bool:
+        if self.address is None or len(self.replay) >= self.MAX_REPLAY:
+            return False
+
+        if self.state == ConnectionState.DISCONNECTED:
+            return False
+
+        self.replay.append(item)
+        return True
+
+    def _replay(self) -> None:
+        if self.replay:
+            Logger.info(f"replaying {len(self.replay)} queued requests")
+
+        while self.replay and self.is_connected:
+            self._execute(self.replay.popleft())
+
+    def _execute(self, item: DCCTaskItem) -> None:
+        if item.requires_connection and not self.is_connected:
+            # never sent, so it is safe to run once the connector is back
+            if not self._defer(item):
+                msg = Message("error", "not connected to apic studio connector")
+                self.response.emit(item.task_id, msg)
+            return
+
+        self._last_activity = time.monotonic()
+        try:
+            res = item.task()
+        except TimeoutError as e:
+            # a slow reply isn't a dead connection, the socket stays open
+            Logger.error(f"apic studio connector didn't answer in time: {e}")
+            res = Message("error", f"request timed out: {e}")
+        except OSError as e:
+            Logger.error(f"connection to apic studio connector failed: {e}")
+            self._on_connection_lost()
+            if item.idempotent and self._defer(item):
                 return
+            res = Message("error", str(e))
+        except Exception as e:
+            Logger.exception(e)
+            res = Message("error", str(e))
 
-            self.repath_textures(p, _seq_repath)
-            if callback:
-                callback()
+        self.response.emit(item.task_id, res)
+
+
+class AsyncDCCBridge(QObject):
+    connected = Signal()
+    disconnected = Signal()
+    state_changed = Signal(str)
+    event_received = Signal(object)
+    preview_rendered = Signal(str, int, int)
+
+    def __init__(self, bridge: DCCBridge, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.bridge = bridge
+        self.render_pool = bridge.render_pool
+        self._callbacks: dict[int, Optional[Callable[[Any], None]]] = {}
+        self._task_ids = count(1)
+
+        self.worker = DCCWorker(bridge)
+        self.t = QThread()
+
+        self.worker.moveToThread(self.t)
+        self.t.started.connect(self.worker.run)
+        self.worker.response.connect(self.on_response)
+        self.worker.state_changed.connect(self.state_changed.emit)
+        self.worker.event.connect(self.event_received.emit)
+        self.bridge.on_connect(self.connected.emit)
+        self.bridge.on_disconnect(self.disconnected.emit)
+        self.bridge.on_disconnect(self.worker.wake)
+        self.t.start()
+
+    def is_err(self, msg: Message) -> bool:
+        return self.bridge.is_err(msg)
+
+    def submit(
+        self,
+        task: DCCTask,
+        callback: Optional[Callable[[Any], None]] = None,
+        idempotent: bool = False,
+        requires_connection: bool = True,
+    ) -> int:
+        task_id = next(self._task_ids)
+        self._callbacks[task_id] = callback
+        self.worker.add_task(
+            DCCTaskItem(task_id, task, idempotent, requires_connection)
+        )
+        return task_id
+
+    def on_response(self, task_id: int, res: Any):
+        callback = self._callbacks.pop(task_id, None)
+        if callback and res is not None:
+            callback(res)
+
+    def call(
+        self,
+        message: str,
+        data: Optional[Any] = None,
+        callback: Optional[DCCCallback] = None,
+        idempotent: bool = False,
+    ) -> int:
+        return self.submit(
+            partial(self.bridge.call, message, data), callback, idempotent
+        )
+
+    def batch(
+        self, messages: list[Message], callback: Optional[DCCBatchCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.batch, messages), callback)
 
-        _seq_repath()
+    def connect(self, address: tuple[str, int]) -> int:
+        return self.submit(
+            partial(self.worker.connect, address), requires_connection=False
+        )
+
+    def on_connect(self, fn: Callable[[], None]) -> None:
+        self.connected.connect(fn)
+
+    def on_disconnect(self, fn: Callable[[], None]) -> None:
+        self.disconnected.connect(fn)
+
+    def models_export_selected(
+        self,
+        path: Path,
+        globalize_textures: bool = False,
+        callback: Optional[DCCCallback] = None,
+    ) -> int:
+        return self.submit(
+            partial(self.bridge.models_export_selected, path, globalize_textures),
+            callback,
+        )
+
+    def models_import(self, path: Path, callback: Optional[DCCCallback] = None) -> int:
+        return self.submit(partial(self.bridge.models_import, path), callback)
+
+    def models_reference(
+        self, path: Path, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.models_reference, path), callback)
+
+    def models_import_all(
+        self, paths: list[Path], callback: Optional[DCCBatchCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.models_import_all, paths), callback)
+
+    def models_reference_all(
+        self, paths: list[Path], callback: Optional[DCCBatchCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.models_reference_all, paths), callback)
+
+    def save_as(
+        self,
+        path: Path,
+        globalize_textures: bool = False,
+        callback: Optional[DCCCallback] = None,
+    ) -> int:
+        return self.submit(
+            partial(self.bridge.save_as, path, globalize_textures), callback
+        )
+
+    def materials_list(self, callback: Optional[DCCCallback] = None) -> int:
+        return self.submit(self.bridge.materials_list, callback, idempotent=True)
+
+    def materials_export(
+        self,
+        materials: list[str],
+        path: Path,
+        globalize_tetxures: bool = False,
+        callback: Optional[DCCCallback] = None,
+    ) -> int:
+        return self.submit(
+            partial(
+                self.bridge.materials_export, materials, path, globalize_tetxures
+            ),
+            callback,
+        )
+
+    def materials_import(
+        self, path: Path, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.materials_import, path), callback)
+
+    def materials_import_all(
+        self, paths: list[Path], callback: Optional[DCCBatchCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.materials_import_all, paths), callback)
+
+    def materials_preview_create(
+        self, path: Path, callback: Optional[Callable[[], None]] = None
+    ) -> Optional[int]:
+        return self.bridge.materials_preview_create(
+            path, callback=callback, progress=self.preview_rendered.emit
+        )
+
+    def materials_preview_create_all(
+        self,
+        path: list[Path],
+        callback: Optional[Callable[[], None]] = None,
+        force: bool = False,
+    ) -> Optional[int]:
+        return self.bridge.materials_preview_create_all(
+            path, callback=callback, force=force, progress=self.preview_rendered.emit
+        )
+
+    def materials_preview_cancel(self, job_id: int) -> bool:
+        return self.bridge.materials_preview_cancel(job_id)
+
+    def hdri_import_as_dome(
+        self, path: Path, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.hdri_import_as_dome, path), callback)
+
+    def hdri_import_as_area(
+        self, path: Path, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(partial(self.bridge.hdri_import_as_area, path), callback)
+
+    def file_open(self, path: Path, callback: Optional[DCCCallback] = None) -> int:
+        return self.submit(partial(self.bridge.file_open, path), callback)
+
+    def upload(self, path: Path, callback: Optional[DCCCallback] = None) -> int:
+        # transfers resume from the last acknowledged chunk, replaying them is safe
+        return self.submit(partial(self.bridge.upload, path), callback, idempotent=True)
+
+    def download(
+        self, remote_path: str, dest: Path, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(
+            partial(self.bridge.download, remote_path, dest), callback, idempotent=True
+        )
+
+    def scene_subscribe(self, callback: Optional[DCCCallback] = None) -> int:
+        return self.submit(self.bridge.scene_subscribe, callback, idempotent=True)
+
+    def scene_snapshot(self, callback: Optional[DCCCallback] = None) -> int:
+        return self.submit(self.bridge.scene_snapshot, callback, idempotent=True)
+
+    def core_metrics(
+        self, reset: bool = False, callback: Optional[DCCCallback] = None
+    ) -> int:
+        return self.submit(
+            partial(self.bridge.core_metrics, reset), callback, idempotent=not reset
+        )
+
+    def repath_textures(
+        self,
+        path: Path,
+        callback: Optional[Callable[[], None]] = None,
+        nocopy: bool = False,
+    ):
+        self.bridge.repath_textures(path, callback=callback, nocopy=nocopy)
+
+    def batch_repath_textures(
+        self, paths: list[Path], callback: Optional[Callable[[], None]] = None
+    ):
+        self.bridge.batch_repath_textures(paths, callback=callback)
+
+    def stop(self):
+        self.worker.stop()
+        self.t.quit()
+        self.t.wait()
 
 
 def render_material(
-    materials: list[Path], callback: Optional[Callable[[], None]] = None
+    materials: list[Path],
+    callback: Optional[Callable[[], None]] = None,
+    progress: Optional[PreviewProgress] = None,
 ):
     builder = CmdBuilder()
-    s = SettingsManager()
-    m = s.MaterialSettings
-    p = Path(s.CoreSettings.root_path) / "scripts" / "render_material.py"
-    if not p.exists():
-        p = (
-            Path(s.CoreSettings.root_path)
-            / "src"
-            / "apic_studio"
-            / "scripts"
-            / "render_material.py"
-        )
+    m = SettingsManager().MaterialSettings
+    p = find_script("render_material.py")
+    if not p:
+        return
 
     builder.add_positional(str(p))
 
@@ -320,7 +1014,7 @@ def render_material(
 
     cmd = builder.build_list()
     c4d = Cinema4D()
-    c4d.run_py(cmd, callback=callback)
+    c4d.run_py(cmd, callback=callback, progress=progress)
 
 
 def repath_textures(
@@ -328,19 +1022,84 @@ def repath_textures(
     nocopy: bool = False,
     callback: Optional[Callable[[], None]] = None,
 ):
-    s = SettingsManager()
-    builder = CmdBuilder()
-    root = Path(s.CoreSettings.root_path)
-    p = root / "scripts" / "repath_textures.py"
-    if not p.exists():
-        Logger.error(f"Cant find scripts path {p}")
-        return
+    repath_textures_batch([scene_path], nocopy=nocopy, callback=callback)
 
-    builder.add_positional(str(p))
-    builder.add_flag("--scene", scene_path)
-    if nocopy:
-        builder.add_flag("--nocopy")
 
-    cmd = builder.build_list()
+class RepathBatch:
+    def __init__(
+        self,
+        scenes: list[Path],
+        shards: int,
+        callback: Optional[Callable[[], None]] = None,
+        progress: Optional[PreviewProgress] = None,
+    ) -> None:
+        self.scenes = scenes
+        self.callback = callback
+        self.progress = progress
+        self.done: list[str] = []
+        self._remaining = shards
+        self._lock = Lock()
+
+    def on_progress(self, scene: str, _: int, __: int):
+        with self._lock:
+            self.done.append(scene)
+            done = len(self.done)
+
+        Logger.info(f"repathed textures {done}/{len(self.scenes)}: {scene}")
+        if self.progress:
+            self.progress(scene, done, len(self.scenes))
+
+    def on_finished(self):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining:
+                return
+
+        failed = {str(s) for s in self.scenes} - set(self.done)
+        if failed:
+            Logger.error(f"failed to repath {len(failed)} scenes: {sorted(failed)}")
+        Logger.info(f"repathed textures of {len(self.done)}/{len(self.scenes)} scenes")
+
+        if self.callback:
+            self.callback()
+
+
+def repath_textures_batch(
+    scenes: list[Path],
+    nocopy: bool = False,
+    callback: Optional[Callable[[], None]] = None,
+    progress: Optional[PreviewProgress] = None,
+):
+    # callers wait for the callback, it has to run even if nothing is repathed
     c4d = Cinema4D()
-    c4d.run_py(cmd, callback=callback)
+    p = find_script("repath_textures.py")
+    if not p:
+        Logger.error("failed to repath textures, repath_textures.py not found")
+    if not p or not scenes or not c4d.get_py():
+        if callback:
+            callback()
+        return
+
+    # c4d startup dominates for small scenes, a few processes share the work
+    shards = max(1, min(REPATH_PROCESSES, len(scenes), os.cpu_count() or 1))
+    batch = RepathBatch(scenes, shards, callback, progress)
+    for i in range(shards):
+        fd, scene_list = tempfile.mkstemp(prefix="apic_repath_", suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(f"{s}\n" for s in scenes[i::shards])
+
+        builder = CmdBuilder()
+        builder.add_positional(str(p))
+        builder.add_flag("--scene-list", scene_list)
+        if nocopy:
+            builder.add_flag("--nocopy")
+        if SettingsManager().CoreSettings.texture_store:
+            builder.add_flag("--texture-store")
+
+        def on_finished(scene_list: str = scene_list):
+            Path(scene_list).unlink(missing_ok=True)
+            batch.on_finished()
+
+        c4d.run_py(
+            builder.build_list(), callback=on_finished, progress=batch.on_progress
+        )
@@ -0,0 +1,666 @@
+import hashlib
+import heapq
+import json
+import os
+import subprocess
+import time
+from enum import IntEnum
+from itertools import count
+from pathlib import Path
+from queue import Queue
+from threading import Event, Thread
+from typing import Any, Callable, Generator, NamedTuple, Optional
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+from apic_studio.core.settings import SettingsManager
+from shared.logger import Logger
+
+PROTOCOL_PREFIX = "@@apic "
+PREVIEW_EXTENSION = ".png"
+CORES_PER_PROCESS = 8
+# more shards than processes lets idle workers pick up the remaining work
+SHARDS_PER_PROCESS = 4
+
+RenderCallback = Callable[[], None]
+PreviewProgress = Callable[[str, int, int], None]
+
+
+class RenderPriority(IntEnum):
+    SHUTDOWN = -1
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+def find_script(name: str) -> Optional[Path]:
+    root = Path(SettingsManager().CoreSettings.root_path)
+    for p in (
+        root / "scripts" / name,
+        root / "src" / "apic_studio" / "scripts" / name,
+    ):
+        if p.exists():
+            return p
+
+    Logger.error(f"can't find script {name} in {root}")
+    return None
+
+
+def default_worker_command() -> Optional[list[str]]:
+    from .dcc import Cinema4D
+
+    script = find_script("render_worker.py")
+    if not script:
+        return None
+
+    c4dpy = Cinema4D().get_py()
+    if not c4dpy:
+        Logger.error("no c4dpy found, material previews can't be rendered")
+        return None
+
+    return [str(c4dpy), str(script)]
+
+
+def render_timeout() -> float:
+    return float(SettingsManager().MaterialSettings.render_timeout)
+
+
+class Watchdog:
+    def __init__(self, timeout: float, on_timeout: Callable[[], None]) -> None:
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.expired = False
+        self._deadline = 0.0
+        self._stopped = Event()
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        if timeout is not None:
+            self.timeout = timeout
+        if self.timeout <= 0:
+            return
+
+        self.expired = False
+        self._stopped.clear()
+        self.feed()
+        Thread(target=self._run, daemon=True).start()
+
+    def feed(self) -> None:
+        self._deadline = time.monotonic() + self.timeout
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(max(0.0, self._deadline - time.monotonic())):
+            if time.monotonic() >= self._deadline:
+                self.expired = True
+                self.on_timeout()
+                return
+
+
+def with_thread_limit(command: list[str], threads: int) -> list[str]:
+    # c4dpy takes the cinema 4d command line flags before the script
+    if threads <= 0 or "-threads" in command:
+        return command
+
+    return [command[0], "-threads", str(threads), *command[1:]]
+
+
+def render_concurrency() -> tuple[int, int]:
+    m = SettingsManager().MaterialSettings
+    cores = os.cpu_count() or 1
+    processes = int(m.render_processes) or cores // CORES_PER_PROCESS
+    processes = max(1, min(processes, cores))
+    threads = int(m.render_threads) or max(1, cores // processes)
+    return processes, threads
+
+
+def preview_fingerprint() -> str:
+    m = SettingsManager().MaterialSettings
+    scene = Path(m.render_scene)
+    scene_mtime = scene.stat().st_mtime_ns if scene.exists() else 0
+    data = [
+        str(scene),
+        scene_mtime,
+        m.render_object,
+        m.render_cam,
+        int(m.render_res_x),
+        int(m.render_res_y),
+        m.renderer,
+    ]
+    return hashlib.sha1(json.dumps(data).encode("utf-8")).hexdigest()
+
+
+def preview_record(material: Path, fingerprint: str) -> dict[str, Any]:
+    stat = material.stat()
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size, "settings": fingerprint}
+
+
+def record_path(material: Path) -> Path:
+    # kept out of the asset metadata so saves from the gui can't drop the record
+    return material.parent / f"{material.stem}.preview.json"
+
+
+def is_preview_current(material: Path, fingerprint: str) -> bool:
+    preview = material.with_suffix(PREVIEW_EXTENSION)
+    try:
+        with open(record_path(material), "r", encoding="utf-8") as f:
+            record = json.load(f)
+        return preview.exists() and record == preview_record(material, fingerprint)
+    except (OSError, ValueError):
+        return False
+
+
+def store_preview_record(material: Path, record: dict[str, Any]) -> None:
+    try:
+        with open(record_path(material), "w", encoding="utf-8") as f:
+            json.dump(record, f)
+    except OSError as e:
+        Logger.warning(f"failed to store preview record for {material.name}: {e}")
+
+
+class RenderJob(NamedTuple):
+    job_id: int
+    materials: list[Path]
+    scene: str
+    object: str
+    camera: str
+    width: int
+    height: int
+    priority: RenderPriority = RenderPriority.BATCH
+    threads: int = 0
+    shard: int = 0
+    # renders previews that are already up to date as well
+    force: bool = False
+
+    @classmethod
+    def from_settings(
+        cls,
+        job_id: int,
+        materials: list[Path],
+        priority: RenderPriority = RenderPriority.BATCH,
+        threads: int = 0,
+        force: bool = False,
+    ) -> "RenderJob":
+        m = SettingsManager().MaterialSettings
+        return cls(
+            job_id,
+            materials,
+            str(m.render_scene),
+            m.render_object,
+            m.render_cam,
+            int(m.render_res_x),
+            int(m.render_res_y),
+            priority,
+            threads,
+            force=force,
+        )
+
+    @property
+    def key(self) -> tuple[Any, ...]:
+        # two jobs with the same key produce the same previews
+        materials = tuple(sorted(str(m) for m in self.materials))
+        return (materials, *self[2:7], self.force)
+
+    def split(self, count: int) -> list["RenderJob"]:
+        # interleaved so materials of the same kind end up in different shards
+        count = max(1, min(count, len(self.materials)))
+        return [
+            self._replace(materials=self.materials[i::count], shard=i)
+            for i in range(count)
+        ]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.job_id,
+            "type": "render",
+            "materials": [str(m) for m in self.materials],
+            "scene": self.scene,
+            "object": self.object,
+            "camera": self.camera,
+            "width": self.width,
+            "height": self.height,
+            "threads": self.threads,
+        }
+
+
+class RenderQueue(Queue[Optional[RenderJob]]):
+    # the following hooks are called by Queue with its mutex held
+    def _init(self, maxsize: int) -> None:
+        self.queue: list[tuple[int, int, Optional[RenderJob]]] = []  # type: ignore
+        self._seq = count()
+        self.cancelled: set[int] = set()
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: Optional[RenderJob]) -> None:
+        priority = item.priority if item else RenderPriority.SHUTDOWN
+        heapq.heappush(self.queue, (priority, next(self._seq), item))
+
+    def _get(self) -> Optional[RenderJob]:
+        _, _, item = heapq.heappop(self.queue)
+        return item
+
+    def remove(self, job_id: int) -> int:
+        with self.mutex:
+            size = len(self.queue)
+            self.queue = [e for e in self.queue if not e[2] or e[2].job_id != job_id]
+            heapq.heapify(self.queue)
+            return size - len(self.queue)
+
+    def reprioritize(self, job_id: int, priority: RenderPriority) -> bool:
+        changed = False
+        with self.mutex:
+            for i, (prio, seq, job) in enumerate(self.queue):
+                if job and job.job_id == job_id and priority < prio:
+                    self.queue[i] = (priority, seq, job._replace(priority=priority))
+                    changed = True
+
+            if changed:
+                heapq.heapify(self.queue)
+
+        return changed
+
+
+class RenderWorker(QObject):
+    started = Signal(int)
+    progress = Signal(int, str, str, int, int)
+    finished = Signal(int, bool)
+    cancelled = Signal(int)
+
+    def __init__(
+        self,
+        command: list[str],
+        jobs: RenderQueue,
+        index: int = 0,
+        parent: Optional[QObject] = None,
+    ):
+        super().__init__(parent)
+        self.command = command
+        self.jobs = jobs
+        self.index = index
+        self.process: Optional[subprocess.Popen[str]] = None
+        self.current: Optional[RenderJob] = None
+        self.watchdog = Watchdog(0, self._on_timeout)
+        self._running = True
+
+    def run(self) -> None:
+        # spawn right away so the first job doesn't pay the c4d startup
+        self._ensure_process()
+
+        while self._running:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            # set before checking so a concurrent cancel either sees the job
+            # running or has already marked it as cancelled
+            self.current = job
+            if job.job_id in self.jobs.cancelled:
+                ok = False
+            else:
+                self.started.emit(job.job_id)
+                ok = self._render(job)
+            self.current = None
+
+            # the pool clears the id once every shard of the job reported back
+            if job.job_id in self.jobs.cancelled:
+                self.cancelled.emit(job.job_id)
+            else:
+                self.finished.emit(job.job_id, ok)
+
+        self._shutdown()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def cancel(self, job_id: int) -> None:
+        current = self.current
+        if current and current.job_id == job_id:
+            # c4dpy can't be interrupted mid render, the process is respawned
+            # for the next job
+            Logger.info(f"cancelling render job {job_id}")
+            self.kill()
+
+    def kill(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+
+    def _on_timeout(self) -> None:
+        job = self.current
+        job_id = job.job_id if job else None
+        Logger.error(
+            f"render worker {self.index} was silent for {self.watchdog.timeout}s "
+            f"on job {job_id}, killing it"
+        )
+        self.kill()
+
+    def _ensure_process(self) -> bool:
+        if self.process and self.process.poll() is None:
+            return True
+
+        Logger.debug(f"starting render worker {self.index}: {self.command}")
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+        except OSError as e:
+            Logger.error(f"failed to start render worker {self.index}: {e}")
+            self.process = None
+            return False
+
+        for event in self._events():
+            if event.get("event") == "ready":
+                threads = event.get("threads") or "all"
+                Logger.info(f"render worker {self.index} ready, {threads} threads")
+                return True
+
+        Logger.error(f"render worker {self.index} exited during startup")
+        return False
+
+    def _events(self) -> Generator[dict[str, Any]]:
+        if not self.process or not self.process.stdout:
+            return
+
+        while line := self.process.stdout.readline():
+            self.watchdog.feed()
+            line = line.rstrip()
+            if not line.startswith(PROTOCOL_PREFIX):
+                Logger.debug(f"[render worker {self.index}] {line}")
+                continue
+
+            try:
+                yield json.loads(line[len(PROTOCOL_PREFIX) :])
+            except json.JSONDecodeError:
+                Logger.error(f"render worker {self.index} sent invalid data: {line}")
+
+    def _send(self, data: dict[str, Any]) -> bool:
+        if not self.process or not self.process.stdin:
+            return False
+
+        try:
+            self.process.stdin.write(json.dumps(data) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            Logger.error(f"failed to send job to render worker {self.index}: {e}")
+            return False
+
+        return True
+
+    def _prepare(self, job: RenderJob) -> tuple[RenderJob, dict[str, dict[str, Any]]]:
+        # staleness is checked here so the gui thread never stats the pool,
+        # records are taken before rendering so edits made meanwhile keep the
+        # preview stale
+        fingerprint = preview_fingerprint()
+        stale: list[Path] = []
+        records: dict[str, dict[str, Any]] = {}
+        for m in job.materials:
+            if not job.force and is_preview_current(m, fingerprint):
+                self.progress.emit(job.job_id, str(m), "", 0, len(job.materials))
+                continue
+
+            stale.append(m)
+            try:
+                records[str(m)] = preview_record(m, fingerprint)
+            except OSError:
+                continue
+
+        skipped = len(job.materials) - len(stale)
+        if skipped:
+            Logger.debug(f"{skipped} material previews are up to date")
+
+        return job._replace(materials=stale), records
+
+    def _render(self, job: RenderJob) -> bool:
+        job, records = self._prepare(job)
+        if not job.materials:
+            return True
+
+        if not self._ensure_process() or not self._send(job.as_dict()):
+            return False
+
+        # read per job so a changed timeout applies without restarting the pool
+        self.watchdog.start(render_timeout())
+        try:
+            return self._await_job(job, records)
+        finally:
+            self.watchdog.stop()
+
+    def _await_job(self, job: RenderJob, records: dict[str, dict[str, Any]]) -> bool:
+        ok = True
+        for event in self._events():
+            if event.get("id") != job.job_id:
+                continue
+
+            match event.get("event"):
+                case "progress":
+                    material = event.get("material", "")
+                    if record := records.get(material):
+                        store_preview_record(Path(material), record)
+
+                    self.progress.emit(
+                        job.job_id,
+                        event.get("material", ""),
+                        event.get("output", ""),
+                        event.get("index", 0),
+                        event.get("total", len(job.materials)),
+                    )
+                case "failed":
+                    mtl, err = event.get("material"), event.get("error")
+                    Logger.error(f"failed to render {mtl}: {err}")
+                    ok = False
+                case "warning":
+                    msg = event.get("message")
+                    Logger.warning(f"render worker {self.index}: {msg}")
+                case "error":
+                    err = event.get("error")
+                    Logger.error(f"render job {job.job_id} failed: {err}")
+                    return False
+                case "done":
+                    return ok
+
+        if job.job_id not in self.jobs.cancelled and not self.watchdog.expired:
+            Logger.error(f"render worker {self.index} exited while rendering")
+        return False
+
+    def _shutdown(self) -> None:
+        if not self.process or self.process.poll() is not None:
+            return
+
+        self._send({"type": "quit"})
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class RenderWorkerPool(QObject):
+    job_started = Signal(int)
+    job_progress = Signal(int, str, int, int)
+    job_finished = Signal(int, bool)
+    job_cancelled = Signal(int)
+
+    def __init__(
+        self,
+        command: Optional[list[str]] = None,
+        size: Optional[int] = None,
+        threads: Optional[int] = None,
+        parent: Optional[QObject] = None,
+    ):
+        super().__init__(parent)
+        self.command = command
+        self.size = size
+        self.threads = threads
+        self.jobs = RenderQueue()
+        self.workers: list[tuple[RenderWorker, QThread]] = []
+        self._callbacks: dict[int, list[RenderCallback]] = {}
+        self._active: dict[tuple[Any, ...], RenderJob] = {}
+        # per job: shards still out, materials rendered and whether all succeeded
+        self._shards: dict[int, int] = {}
+        self._done: dict[int, int] = {}
+        self._ok: dict[int, bool] = {}
+        self._running: set[int] = set()
+        self._next_id = 1
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.workers)
+
+    def start(self) -> bool:
+        if self.workers:
+            return True
+
+        command = self.command or default_worker_command()
+        if not command:
+            return False
+
+        processes, threads = render_concurrency()
+        self.size = self.size or processes
+        self.threads = self.threads or threads
+        if not self.command:
+            command = with_thread_limit(command, self.threads)
+        Logger.info(
+            f"starting {self.size} render workers with {self.threads} threads each"
+        )
+
+        for i in range(self.size):
+            worker = RenderWorker(command, self.jobs, i)
+            t = QThread()
+            worker.moveToThread(t)
+            t.started.connect(worker.run)
+            worker.started.connect(self.on_started)
+            worker.progress.connect(self.on_progress)
+            worker.finished.connect(self.on_finished)
+            worker.cancelled.connect(self.on_cancelled)
+            t.start()
+            self.workers.append((worker, t))
+
+        return True
+
+    def submit(
+        self,
+        materials: list[Path],
+        callback: Optional[RenderCallback] = None,
+        priority: RenderPriority = RenderPriority.BATCH,
+        force: bool = False,
+    ) -> Optional[int]:
+        if not self.start():
+            return None
+
+        job = RenderJob.from_settings(
+            self._next_id, materials, priority, self.threads or 0, force
+        )
+        if existing := self._active.get(job.key):
+            Logger.debug(f"render job {existing.job_id} already queued")
+            if callback:
+                self._callbacks[existing.job_id].append(callback)
+            self.jobs.reprioritize(existing.job_id, priority)
+            return existing.job_id
+
+        self._next_id += 1
+        self._active[job.key] = job
+        self._callbacks[job.job_id] = [callback] if callback else []
+
+        shards = job.split((self.size or 1) * SHARDS_PER_PROCESS)
+        self._shards[job.job_id] = len(shards)
+        self._done[job.job_id] = 0
+        self._ok[job.job_id] = True
+        for shard in shards:
+            self.jobs.put(shard)
+
+        return job.job_id
+
+    def cancel(self, job_id: int) -> bool:
+        if job_id not in self._shards:
+            return False
+
+        self.jobs.cancelled.add(job_id)
+        self._shards[job_id] -= self.jobs.remove(job_id)
+        for worker, _ in self.workers:
+            worker.cancel(job_id)
+
+        if self._shards[job_id] <= 0:
+            self._complete(job_id)
+
+        return True
+
+    def cancel_all(self) -> None:
+        for job in list(self._active.values()):
+            self.cancel(job.job_id)
+
+    def _pop_job(self, job_id: int) -> list[RenderCallback]:
+        for key, job in list(self._active.items()):
+            if job.job_id == job_id:
+                del self._active[key]
+
+        self._shards.pop(job_id, None)
+        self._done.pop(job_id, None)
+        self._ok.pop(job_id, None)
+        self._running.discard(job_id)
+        self.jobs.cancelled.discard(job_id)
+        return self._callbacks.pop(job_id, [])
+
+    def _total(self, job_id: int) -> int:
+        job = next((j for j in self._active.values() if j.job_id == job_id), None)
+        return len(job.materials) if job else 0
+
+    def _complete(self, job_id: int):
+        if job_id in self.jobs.cancelled:
+            self._pop_job(job_id)
+            Logger.info(f"cancelled render job {job_id}")
+            self.job_cancelled.emit(job_id)
+            return
+
+        ok = self._ok.get(job_id, False)
+        callbacks = self._pop_job(job_id)
+        self.job_finished.emit(job_id, ok)
+        if callbacks:
+            Logger.info("finished rendering material previews")
+
+        for callback in callbacks:
+            callback()
+
+    def _shard_done(self, job_id: int, ok: bool):
+        if job_id not in self._shards:
+            return
+
+        self._ok[job_id] = self._ok[job_id] and ok
+        self._shards[job_id] -= 1
+        if self._shards[job_id] <= 0:
+            self._complete(job_id)
+
+    def on_started(self, job_id: int):
+        if job_id in self._shards and job_id not in self._running:
+            self._running.add(job_id)
+            self.job_started.emit(job_id)
+
+    def on_progress(self, job_id: int, material: str, output: str, _: int, __: int):
+        if job_id not in self._done:
+            return
+
+        self._done[job_id] += 1
+        self.job_progress.emit(job_id, output, self._done[job_id], self._total(job_id))
+
+    def on_finished(self, job_id: int, ok: bool):
+        self._shard_done(job_id, ok)
+
+    def on_cancelled(self, job_id: int):
+        self._shard_done(job_id, False)
+
+    def stop(self):
+        for worker, _ in self.workers:
+            worker.stop()
+            self.jobs.put(None)
+
+        for worker, t in self.workers:
+            t.quit()
+            if not t.wait(2000):
+                worker.kill()
+                t.wait()
+
+        self.workers.clear()
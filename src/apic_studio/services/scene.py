@@ -0,0 +1,60 @@
+from typing import Any, Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from shared.messaging import Message
+from shared.messaging.events import DOCUMENT_EVENT, SCENE_EVENTS
+
+from .dcc import AsyncDCCBridge
+
+
+class SceneMirror(QObject):
+    changed = Signal()
+
+    def __init__(self, dcc: AsyncDCCBridge, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.dcc = dcc
+        self.document = ""
+        self.materials: list[str] = []
+        self.objects: list[str] = []
+        self.selection: list[str] = []
+        self.is_synced = False
+
+        self.dcc.on_connect(self.subscribe)
+        self.dcc.on_disconnect(self.invalidate)
+        self.dcc.event_received.connect(self.on_event)
+
+    def subscribe(self):
+        self.dcc.scene_subscribe(callback=self.on_snapshot)
+
+    def invalidate(self):
+        # subscriptions die with the connection, on_connect subscribes again
+        self.is_synced = False
+
+    def on_snapshot(self, res: Message):
+        if res.message != "scene" or not isinstance(res.data, dict):
+            return
+
+        self.load(res.data)
+
+    def load(self, snapshot: dict[str, Any]):
+        self.document = snapshot.get("document", "")
+        for key in SCENE_EVENTS:
+            setattr(self, key, snapshot.get(key, []))
+
+        self.is_synced = True
+        self.changed.emit()
+
+    def on_event(self, event: Message):
+        if not self.is_synced or not isinstance(event.data, dict):
+            return
+
+        if event.message == DOCUMENT_EVENT:
+            self.load(event.data)
+            return
+
+        for key, name in SCENE_EVENTS.items():
+            if event.message == name:
+                setattr(self, key, event.data.get(key, []))
+                self.changed.emit()
+                return
@@ -1,6 +1,5 @@
-import shutil
 from pathlib import Path
-from typing import Optional, override
+from typing import Optional
 
 from PySide6.QtCore import QSize, Qt, Signal
 from PySide6.QtGui import QIcon
@@ -191,13 +190,11 @@ class ViewportButton(QWidget):
         self.icon.setIcon(icon)
         self.icon.setIconSize(QSize(size, size))
 
-    @override
-    def deleteLater(self):
-        if self.file.is_dir():
-            shutil.rmtree(self.file, ignore_errors=True)
-        else:
-            shutil.rmtree(self.file.parent, ignore_errors=True)
-        super().deleteLater()
+    def is_selected(self) -> bool:
+        return self.icon.isChecked()
+
+    def set_selected(self, selected: bool):
+        self.icon.setChecked(selected)
 
 
 class ConnectionButton(QPushButton):
@@ -220,3 +217,9 @@ class ConnectionButton(QPushButton):
             "ConnectionButton{background-color: #c53a3e;} ConnectionButton::hover{background-color: #722224}"
         )
         self.setIcon(QIcon(":icons/icon-power-off.png"))
+
+    def set_reconnecting(self):
+        self.setStyleSheet(
+            "ConnectionButton{background-color: #ebb134;} ConnectionButton::hover{background-color: #7a5c1b}"
+        )
+        self.setIcon(QIcon(":icons/icon-power-off.png"))
@@ -1,7 +1,8 @@
+import os
 from dataclasses import dataclass
 from enum import StrEnum
 from pathlib import Path
-from typing import Literal, NamedTuple, Optional
+from typing import Any, Callable, Literal, NamedTuple, Optional
 
 from PySide6.QtCore import QPoint, Qt, Signal
 from PySide6.QtGui import QCursor, QIcon, QMouseEvent
@@ -30,7 +31,12 @@ from PySide6.QtWidgets import (
 )
 
 from apic_studio.core.settings import SettingsManager
-from apic_studio.services import Backup, BackupManager
+from apic_studio.services import (
+    AsyncBackup,
+    Backup,
+    BackupIndex,
+    BackupManager,
+)
 from shared.logger import Logger
 
 from .buttons import IconButton
@@ -439,6 +445,8 @@ class SettingsDialog(QDialog):
         self.addr = QLineEdit("localhost")
         self.root_path = QLineEdit(self.settings.CoreSettings.root_path)
         self.browse_root = QPushButton(QIcon(":icons/tabler-icon-folder-open.png"), "")
+        self.texture_store = QCheckBox()
+        self.chunked_backups = QCheckBox()
 
         self.window_settings = QGroupBox("Window Settings")
 
@@ -459,6 +467,16 @@ class SettingsDialog(QDialog):
         self.render_resolution_y.setButtonSymbols(
             QAbstractSpinBox.ButtonSymbols.NoButtons
         )
+        self.render_processes = QSpinBox()
+        self.render_processes.setRange(0, os.cpu_count() or 1)
+        self.render_processes.setSpecialValueText("Auto")
+        self.render_threads = QSpinBox()
+        self.render_threads.setRange(0, os.cpu_count() or 1)
+        self.render_threads.setSpecialValueText("Auto")
+        self.render_timeout = QSpinBox()
+        self.render_timeout.setRange(0, 24 * 60 * 60)
+        self.render_timeout.setSuffix(" s")
+        self.render_timeout.setSpecialValueText("Never")
 
         self.model_settings = QGroupBox("Model Settings")
         self.screenshot_opacity = QDoubleSpinBox()
@@ -483,6 +501,8 @@ class SettingsDialog(QDialog):
         self.core_settings_layout.addRow("Cinema 4D socket address", self.addr)
         self.core_settings_layout.addRow("Cinema 4D socket port", self.socket_port)
         self.core_settings_layout.addRow("Root Path", self.root_layout)
+        self.core_settings_layout.addRow("Shared Texture Store", self.texture_store)
+        self.core_settings_layout.addRow("Chunked Backups", self.chunked_backups)
 
         self.general_settings_layout = QFormLayout(self.window_settings)
 
@@ -505,6 +525,15 @@ class SettingsDialog(QDialog):
         self.material_settings_layout.addRow(
             QLabel("Render Resolution"), self.resolution_layout
         )
+        self.material_settings_layout.addRow(
+            QLabel("Render Processes"), self.render_processes
+        )
+        self.material_settings_layout.addRow(
+            QLabel("Threads per Process"), self.render_threads
+        )
+        self.material_settings_layout.addRow(
+            QLabel("Render Timeout"), self.render_timeout
+        )
 
         self.model_settings_layout = QFormLayout(self.model_settings)
         self.model_settings_layout.addRow(
@@ -558,12 +587,17 @@ class SettingsDialog(QDialog):
 
         self.socket_port.setValue(core.socket_port)
         self.addr.setText(core.socket_addr)
+        self.texture_store.setChecked(core.texture_store)
+        self.chunked_backups.setChecked(core.chunked_backups)
 
         self.render_scene.setText(mat.render_scene)
         self.render_object.setText(mat.render_object)
         self.render_cam.setText(mat.render_cam)
         self.render_resolution_x.setValue(mat.render_res_x)
         self.render_resolution_y.setValue(mat.render_res_y)
+        self.render_processes.setValue(mat.render_processes)
+        self.render_threads.setValue(mat.render_threads)
+        self.render_timeout.setValue(mat.render_timeout)
 
         self.screenshot_opacity.setValue(mod.screenshot_opacity)
 
@@ -575,12 +609,17 @@ class SettingsDialog(QDialog):
 
         core.socket_port = self.socket_port.value()
         core.socket_addr = self.addr.text()
+        core.texture_store = self.texture_store.isChecked()
+        core.chunked_backups = self.chunked_backups.isChecked()
 
         mat.render_res_x = self.render_resolution_x.value()
         mat.render_res_y = self.render_resolution_y.value()
         mat.render_object = self.render_object.text()
         mat.render_scene = self.render_scene.text()
         mat.render_cam = self.render_cam.text()
+        mat.render_processes = self.render_processes.value()
+        mat.render_threads = self.render_threads.value()
+        mat.render_timeout = self.render_timeout.value()
 
         mod.screenshot_opacity = self.screenshot_opacity.value()
 
@@ -603,6 +642,10 @@ class BackupDialog(QDialog):
         self.archive_path = archive_path
         self.elements: dict[str, tuple[QTreeWidgetItem, Backup]] = {}
         self.backup = BackupManager()
+        self.index = BackupIndex(archive_path)
+        self.indexer = AsyncBackup(self.backup)
+        self._restore_progress: Optional[ProgressDialog] = None
+        self._on_restored: Optional[Callable[[Path], None]] = None
 
         self.setWindowIcon(QIcon(":icons/apic_logo.png"))
         self.setWindowTitle("Backup Viewer")
@@ -616,6 +659,7 @@ class BackupDialog(QDialog):
         self.open_model = QPushButton("Open")
         self.import_model = QPushButton("Import")
         self.reference_model = QPushButton("Reference")
+        self.rescan = QPushButton("Rescan")
 
         self.tree_widget = QTreeWidget(self)
         self.tree_widget.setSelectionMode(
@@ -623,18 +667,59 @@ class BackupDialog(QDialog):
         )
         self.tree_widget.setHeaderLabels(["Backups"])
 
-        for pool_backup in self.backup.load_from_pool(self.archive_path):
-            archive_item = QTreeWidgetItem(
-                self.tree_widget, [pool_backup[0].original_name]
+        # assets come from the pool index, versions are listed once expanded
+        assets = self.index.load()
+        if assets is None:
+            self.rescan_pool()
+        else:
+            self.populate(assets)
+
+    def populate(self, assets: dict[str, list[int]]):
+        self.tree_widget.clear()
+        self.elements.clear()
+        for name in sorted(assets, key=str.lower):
+            item = QTreeWidgetItem(self.tree_widget, [name])
+            item.setChildIndicatorPolicy(
+                QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator
+            )
+
+    def rescan_pool(self):
+        self.rescan.setEnabled(False)
+        self.tree_widget.clear()
+        self.elements.clear()
+        QTreeWidgetItem(self.tree_widget, ["Indexing backups..."])
+        self.indexer.index_pool(self.archive_path)
+
+    def on_indexed(self, _: Path, assets: dict[str, list[int]]):
+        self.rescan.setEnabled(True)
+        self.populate(assets)
+
+    def on_item_expanded(self, item: QTreeWidgetItem):
+        if item.parent() or item.childCount():
+            return
+
+        asset = item.text(0)
+        backups = sorted(
+            self.backup.load_from_asset(self.archive_path / asset),
+            key=lambda b: b.version,
+        )
+        # the listing is authoritative, it fixes entries other machines missed
+        self.index.update(asset, backups)
+        if not backups:
+            item.setChildIndicatorPolicy(
+                QTreeWidgetItem.ChildIndicatorPolicy.DontShowIndicator
             )
-            for asset_backup in pool_backup:
-                item = QTreeWidgetItem(archive_item, [asset_backup.name])
-                self.elements[asset_backup.name] = (item, asset_backup)
+            return
+
+        for b in backups:
+            child = QTreeWidgetItem(item, [b.name])
+            self.elements[b.name] = (child, b)
 
     def init_layouts(self):
         self.main_layout = QVBoxLayout(self)
         self.select_layout = QHBoxLayout()
 
+        self.select_layout.addWidget(self.rescan)
         self.select_layout.addStretch()
         self.select_layout.addWidget(self.open_model)
         self.select_layout.addWidget(self.import_model)
@@ -647,29 +732,61 @@ class BackupDialog(QDialog):
         self.import_model.clicked.connect(lambda: self.import_selection())
         self.reference_model.clicked.connect(lambda: self.reference_selection())
         self.open_model.clicked.connect(lambda: self.open_selection())
+        self.rescan.clicked.connect(lambda: self.rescan_pool())
+        self.tree_widget.itemExpanded.connect(self.on_item_expanded)
+        self.indexer.indexed.connect(self.on_indexed)
+        self.indexer.restore_progress.connect(self.on_restore_progress)
+        self.indexer.restored.connect(self.on_restored)
 
     def import_selection(self):
-        path = self.get_selected_path()
-        if not path:
-            Logger.error(f"can't import model, path is: {path}")
-            return
-        self.imported.emit(path)
-        self.close()
+        self.restore_selection("import", self.imported.emit)
 
     def reference_selection(self):
-        path = self.get_selected_path()
-        if not path:
-            Logger.error(f"can't reference model, path is: {path}")
-            return
-        self.referenced.emit(path)
-        self.close()
+        self.restore_selection("reference", self.referenced.emit)
 
     def open_selection(self):
-        path = self.get_selected_path()
-        if not path:
-            Logger.error(f"can't open model, path is: {path}")
+        self.restore_selection("open", self.opened.emit)
+
+    def restore_selection(self, action: str, callback: Callable[[Path], None]):
+        if self._restore_progress:
             return
-        self.opened.emit(path)
+
+        backup = self.get_selected_backup()
+        if not backup:
+            Logger.error(f"can't {action} model, no backup selected")
+            return
+
+        if not backup.is_chunked:
+            callback(backup.path)
+            self.close()
+            return
+
+        # rebuilding a large scene from its chunks takes a while
+        self._on_restored = callback
+        task = self.indexer.restore(backup)
+        prog = ProgressDialog(f"Restoring {backup.name}...", 0, 100, self)
+        prog.canceled.connect(task.stop)
+        self._restore_progress = prog
+        prog.show()
+
+    def on_restore_progress(self, _: Path, percent: int):
+        if self._restore_progress:
+            self._restore_progress.setValue(percent)
+
+    def on_restored(self, backup: Path, path: Optional[Path]):
+        cancelled = False
+        if prog := self._restore_progress:
+            cancelled = prog.wasCanceled()
+            prog.close()
+        callback = self._on_restored
+        self._restore_progress = self._on_restored = None
+
+        if not path or not callback:
+            if not cancelled:
+                Logger.error(f"failed to restore backup {backup.stem}")
+            return
+
+        callback(path)
         self.close()
 
     def get_item_level(self, item: QTreeWidgetItem):
@@ -679,17 +796,18 @@ class BackupDialog(QDialog):
             level += 1
         return level
 
-    def get_selected_path(self) -> Optional[Path]:
-        selected = self.tree_widget.selectedItems()[0]
-        item_name = selected.text(0)
-
-        _, backup = self.elements[item_name]
+    def get_selected_backup(self) -> Optional[Backup]:
+        selected = self.tree_widget.selectedItems()
+        if not selected:
+            Logger.error("no backup selected")
+            return None
 
-        if not self.get_item_level(selected) == 1:
+        if not self.get_item_level(selected[0]) == 1:
             Logger.error("select an archived version instead of the group")
             return None
 
-        return backup.path
+        _, backup = self.elements[selected[0].text(0)]
+        return backup
 
 
 class CreateBackupDialog(QDialog):
@@ -959,6 +1077,68 @@ class RenameAssetDialog(QDialog):
         super().accept()
 
 
+class MetricsDialog(QDialog):
+    refresh = Signal()
+    reset = Signal()
+
+    COLUMNS = ["Route", "Count", "Mean", "p50", "p90", "p99", "Max"]
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("Connector Metrics")
+        self.setWindowIcon(QIcon(":icons/apic_logo.png"))
+        self.setStyleSheet("QWidget {background-color: #333; color: #fff}")
+        self.resize(800, 500)
+
+        self.init_widgets()
+        self.init_layouts()
+        self.init_signals()
+
+    def init_widgets(self):
+        self.refresh_btn = QPushButton("Refresh")
+        self.reset_btn = QPushButton("Reset")
+
+        self.tree_widget = QTreeWidget(self)
+        self.tree_widget.setHeaderLabels(self.COLUMNS)
+        self.tree_widget.setSortingEnabled(True)
+
+        self.connector_item = QTreeWidgetItem(self.tree_widget, ["Connector"])
+        self.client_item = QTreeWidgetItem(self.tree_widget, ["Client"])
+
+    def init_layouts(self):
+        self.main_layout = QVBoxLayout(self)
+        self.buttons_layout = QHBoxLayout()
+
+        self.buttons_layout.addStretch()
+        self.buttons_layout.addWidget(self.refresh_btn)
+        self.buttons_layout.addWidget(self.reset_btn)
+
+        self.main_layout.addWidget(self.tree_widget)
+        self.main_layout.addLayout(self.buttons_layout)
+
+    def init_signals(self):
+        self.refresh_btn.clicked.connect(self.refresh.emit)
+        self.reset_btn.clicked.connect(self.reset.emit)
+
+    def set_connector_metrics(self, snapshot: dict[str, dict[str, Any]]):
+        self._fill(self.connector_item, snapshot)
+
+    def set_client_metrics(self, snapshot: dict[str, dict[str, Any]]):
+        self._fill(self.client_item, snapshot)
+
+    def _fill(self, parent: QTreeWidgetItem, snapshot: dict[str, dict[str, Any]]):
+        parent.takeChildren()
+        for route, hists in sorted(snapshot.items()):
+            route_item = QTreeWidgetItem(parent, [route])
+            for name, summary in sorted(hists.items()):
+                row = [name, str(summary.get("count", 0))]
+                for key in ("mean", "p50", "p90", "p99", "max"):
+                    row.append(f"{summary.get(key, 0):.2f}")
+                QTreeWidgetItem(route_item, row)
+
+        parent.setExpanded(True)
+
+
 def files_dialog(title: str = "Select Files") -> tuple[list[str], str]:
     folder = QFileDialog.getOpenFileNames(caption=title)
     return folder
@@ -9,9 +9,17 @@ from PySide6.QtWidgets import QHBoxLayout, QSplitter, QVBoxLayout, QWidget
 
 from apic_studio import __version__
 from apic_studio.core.settings import SettingsManager
-from apic_studio.services import AssetLoader, DCCBridge, Screenshot, pools
+from apic_studio.services import (
+    AssetLoader,
+    AsyncDCCBridge,
+    ConnectionState,
+    SceneMirror,
+    Screenshot,
+    pools,
+)
 from apic_studio.ui.attribute_editor import AttributeEditor
 from apic_studio.ui.buttons import ViewportButton
+from apic_studio.ui.dialogs import MetricsDialog, ProgressDialog
 from apic_studio.ui.toolbar import (
     HdriToolbar,
     MaterialToolbar,
@@ -22,6 +30,7 @@ from apic_studio.ui.toolbar import (
     ToolbarDirection,
 )
 from apic_studio.ui.viewport import Viewport
+from shared.messaging import Message, metrics
 
 
 class MainWindow(QWidget):
@@ -29,16 +38,19 @@ class MainWindow(QWidget):
 
     def __init__(
         self,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
         settings: SettingsManager,
         parent: Optional[QWidget] = None,
     ):
         super().__init__(parent)
         self._widgets: dict[Path, ViewportButton] = {}
         self.settings = settings
+        self.metrics_dialog: Optional[MetricsDialog] = None
+        self.render_progress: dict[int, ProgressDialog] = {}
         self.loader = AssetLoader()
         self.screenshot = Screenshot()
         self.dcc = dcc
+        self.scene = SceneMirror(self.dcc)
 
         self.vp_map: dict[str, Any] = {
             "materials": self.settings.MaterialSettings,
@@ -72,7 +84,9 @@ class MainWindow(QWidget):
             pools.ApicModelPoolManager(), self.dcc, label="Apic Models"
         )
         self.apic_model_tb.set_current_pool(self.settings.ModelSettings.current_pool)
-        self.material_tb = MaterialToolbar(pools.MaterialPoolManager(), self.dcc)
+        self.material_tb = MaterialToolbar(
+            pools.MaterialPoolManager(), self.dcc, self.scene
+        )
         self.material_tb.set_current_pool(self.settings.MaterialSettings.current_pool)
         self.lightset_tb = ModelToolbar(
             pools.LightsetPoolManager(), self.dcc, label="Lightsets"
@@ -127,20 +141,34 @@ class MainWindow(QWidget):
         s.hdris.clicked.connect(lambda: self.set_view("hdris"))
         self.dcc.on_connect(s.conn_btn.set_connected)
         self.dcc.on_disconnect(s.conn_btn.set_disconnected)
+        self.dcc.state_changed.connect(self.on_connection_state_changed)
         s.conn_btn.clicked.connect(
             lambda: self.dcc.connect(self.settings.CoreSettings.address)
         )
         self.viewport.asset_clicked.connect(self.attrib_editor.load.emit)
         self.material_tb.render_previews.connect(self.render_previews)
+        self.status.metrics_btn.clicked.connect(self.show_metrics)
+        if pool := self.dcc.render_pool:
+            pool.job_progress.connect(self.on_render_progress)
+            pool.job_finished.connect(lambda x, _: self.close_render_progress(x))
+            pool.job_cancelled.connect(self.close_render_progress)
 
         for t in self.toolbar.multibars.values():
             t.pool_changed.connect(self.draw)
-            t.asset_changed.connect(self.loader.load_asset)
+            t.asset_changed.connect(self.viewport.refresh_asset)
             t.force_refresh.connect(lambda x: self.draw(x, force=True))  # type: ignore
             t.search_text_changed.connect(
                 lambda x: self.draw(x[0], filter=x[1])  # type: ignore
             )
 
+    def on_connection_state_changed(self, state: str):
+        if state == ConnectionState.RECONNECTING:
+            self.sidebar.conn_btn.set_reconnecting()
+        elif state == ConnectionState.CONNECTED:
+            self.sidebar.conn_btn.set_connected()
+        elif state == ConnectionState.DISCONNECTED:
+            self.sidebar.conn_btn.set_disconnected()
+
     def closeEvent(self, event: QCloseEvent) -> None:
         geo = self.geometry()
         self.settings.WindowSettings.window_geometry = [
@@ -186,6 +214,48 @@ class MainWindow(QWidget):
 
     def render_previews(self):
         materials = [m for w in self.viewport.widgets.values() if (m := w.file)]
-        self.dcc.materials_preview_create_all(
-            materials, callback=lambda: self.draw(force=True)
-        )
+        if not materials:
+            return
+
+        job_id = self.dcc.materials_preview_create_all(materials)
+        if job_id is None or job_id in self.render_progress:
+            return
+
+        prog = ProgressDialog("Rendering Previews...", 0, len(materials), self)
+        prog.canceled.connect(lambda: self.dcc.materials_preview_cancel(job_id))
+        self.render_progress[job_id] = prog
+        prog.show()
+
+    def on_render_progress(self, job_id: int, _: str, done: int, total: int):
+        if prog := self.render_progress.get(job_id):
+            prog.setMaximum(total)
+            prog.setValue(done)
+
+    def close_render_progress(self, job_id: int):
+        if prog := self.render_progress.pop(job_id, None):
+            prog.close()
+
+    def show_metrics(self):
+        if not self.metrics_dialog:
+            self.metrics_dialog = MetricsDialog(self)
+            self.metrics_dialog.refresh.connect(self.refresh_metrics)
+            self.metrics_dialog.reset.connect(lambda: self.refresh_metrics(reset=True))
+
+        self.refresh_metrics()
+        self.metrics_dialog.show()
+        self.metrics_dialog.raise_()
+
+    def refresh_metrics(self, reset: bool = False):
+        dialog = self.metrics_dialog
+        if not dialog:
+            return
+
+        dialog.set_client_metrics(metrics.snapshot())
+        if reset:
+            metrics.reset()
+
+        def on_metrics(res: Message):
+            if res.message == "metrics" and isinstance(res.data, dict):
+                dialog.set_connector_metrics(res.data)
+
+        self.dcc.core_metrics(reset, callback=on_metrics)
@@ -13,7 +13,12 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from apic_studio.services import AssetConverter, DCCBridge, PoolManager
+from apic_studio.services import (
+    AssetConverter,
+    AsyncDCCBridge,
+    PoolManager,
+    SceneMirror,
+)
 from apic_studio.ui.dialogs import (
     BackupDialog,
     CreatePoolDialog,
@@ -29,6 +34,7 @@ from apic_studio.ui.dialogs import (
 from apic_studio.ui.lines import VLine
 from apic_studio.ui.log_viewer import LogViewer
 from shared.logger import Logger
+from shared.messaging import Message
 from shared.utils import sanitize_string
 
 from .buttons import ConnectionButton, IconButton, SidebarButton
@@ -264,6 +270,7 @@ class Statusbar(Toolbar):
         self.info.setMinimumWidth(20)
 
         self.logs_btn = QPushButton("Logs")
+        self.metrics_btn = QPushButton("Metrics")
 
         self.clear_btn = QPushButton("x")
         self.clear_btn.setFixedWidth(20)
@@ -277,6 +284,7 @@ class Statusbar(Toolbar):
         self.main_layout.addWidget(self.info)
         self.main_layout.addWidget(self.clear_btn)
         self.main_layout.addWidget(self.logs_btn)
+        self.main_layout.addWidget(self.metrics_btn)
 
     @override
     def init_signals(self) -> None:
@@ -355,7 +363,7 @@ class AssetToolbar(LabledToolbar):
         self,
         label: str,
         pool: PoolManager,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
         thickness: int = 30,
         direction: ToolbarDirection = ToolbarDirection.Horizontal,
         parent: QWidget | None = None,
@@ -513,7 +521,7 @@ class ModelToolbar(AssetToolbar):
     def __init__(
         self,
         pool: PoolManager,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
         label: str = "Models",
         thickness: int = 40,
         direction: ToolbarDirection = ToolbarDirection.Horizontal,
@@ -627,18 +635,24 @@ class ModelToolbar(AssetToolbar):
         file_dir.mkdir(parents=True, exist_ok=True)
         file_path = file_dir / f"{name}.{ext}"
 
+        def on_exported(res: Message):
+            self.asset_changed.emit(file_dir)
+            if copy_textures and not self.dcc.is_err(res):
+                self.dcc.repath_textures(file_path)
+
         if export_type == ExportModelDialog.ExportType.SAVE:
-            self.dcc.save_as(file_path, globalize_textures=data.globalize_textures)
+            self.dcc.save_as(
+                file_path,
+                globalize_textures=data.globalize_textures,
+                callback=on_exported,
+            )
         elif export_type == ExportModelDialog.ExportType.EXPORT:
             self.dcc.models_export_selected(
-                file_path, globalize_textures=data.globalize_textures
+                file_path,
+                globalize_textures=data.globalize_textures,
+                callback=on_exported,
             )
 
-        self.pool_changed.emit(self.current_pool)
-
-        if copy_textures:
-            self.dcc.repath_textures(file_path)
-
 
 class MaterialToolbar(AssetToolbar):
     render_previews = Signal()
@@ -646,12 +660,14 @@ class MaterialToolbar(AssetToolbar):
     def __init__(
         self,
         pool: PoolManager,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
+        scene: Optional[SceneMirror] = None,
         label: str = "Materials",
         thickness: int = 40,
         direction: ToolbarDirection = ToolbarDirection.Horizontal,
         parent: QWidget | None = None,
     ):
+        self.scene = scene
         super().__init__(label, pool, dcc, thickness, direction, parent)
 
     @override
@@ -704,12 +720,21 @@ class MaterialToolbar(AssetToolbar):
         self.searchbar.text_changed.connect(self.on_search)
 
     def export_dialog(self):
-        res = self.dcc.materials_list()
+        if self.scene and self.scene.is_synced:
+            self.open_export_dialog(list(self.scene.materials))
+            return
+
+        self.dcc.materials_list(callback=self.on_materials_list)
+
+    def on_materials_list(self, res: Message):
         if self.dcc.is_err(res) or not res.data:
             Logger.error("Failed to get materials.list")
             return
 
-        dialog = ExportMaterialDialog(res.data.get("materials", []))
+        self.open_export_dialog(res.data.get("materials", []))
+
+    def open_export_dialog(self, materials: list[str]):
+        dialog = ExportMaterialDialog(materials)
         dialog.finished.connect(self.on_export_dialog_finished)
         dialog.exec()
 
@@ -732,17 +757,21 @@ class MaterialToolbar(AssetToolbar):
             file_path = file_dir / f"{mtl}.{data.ext}"
             mtl_paths.append(file_path)
 
+        pool = self.current_pool
+
+        def on_exported(res: Message):
+            for p in mtl_paths:
+                self.asset_changed.emit(p.parent)
+            if data.copy_textures and not self.dcc.is_err(res):
+                self.dcc.batch_repath_textures(mtl_paths)
+
         self.dcc.materials_export(
             data.materials,
-            self.current_pool,
+            pool,
             globalize_tetxures=data.globalize_textures,
+            callback=on_exported,
         )
 
-        self.pool_changed.emit(self.current_pool)
-
-        if data.copy_textures:
-            self.dcc.batch_repath_textures(mtl_paths)
-
     def on_search(self, text: str):
         self.search_text_changed.emit((self.current_pool, text))
 
@@ -751,7 +780,7 @@ class HdriToolbar(AssetToolbar):
     def __init__(
         self,
         pool: PoolManager,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
         label: str = "Hdris",
         thickness: int = 40,
         direction: ToolbarDirection = ToolbarDirection.Horizontal,
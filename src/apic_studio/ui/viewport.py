@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import bisect
+import shutil
 from collections import deque
 from functools import partial
 from pathlib import Path
@@ -11,9 +13,19 @@ from PySide6.QtWidgets import QHBoxLayout, QMenu, QScrollArea, QWidget
 
 from apic_studio.core import Asset
 from apic_studio.core.settings import SettingsManager
-from apic_studio.services import AssetLoader, BackupManager, DCCBridge, Screenshot
+from apic_studio.services import (
+    AssetLoader,
+    AsyncBackup,
+    AsyncDCCBridge,
+    BackupManager,
+    Screenshot,
+)
 from apic_studio.ui.buttons import ViewportButton
-from apic_studio.ui.dialogs import CreateBackupDialog, RenameAssetDialog
+from apic_studio.ui.dialogs import (
+    CreateBackupDialog,
+    ProgressDialog,
+    RenameAssetDialog,
+)
 from apic_studio.ui.flow_layout import FlowLayout
 from shared.logger import Logger
 
@@ -23,7 +35,7 @@ class Viewport(QWidget):
 
     def __init__(
         self,
-        dcc: DCCBridge,
+        dcc: AsyncDCCBridge,
         settings: SettingsManager,
         loader: AssetLoader,
         screenshot: Screenshot,
@@ -44,6 +56,9 @@ class Viewport(QWidget):
         self.curr_view = "materials"
         self.curr_pool: Path
         self.backup = BackupManager()
+        self.async_backup = AsyncBackup(self.backup, self)
+        self._backup_progress: dict[Path, ProgressDialog] = {}
+        self._open_after_backup: set[Path] = set()
 
         self._pending_assets: Deque[Path] = deque()
         self._load_timer: QTimer = QTimer(self)
@@ -54,6 +69,8 @@ class Viewport(QWidget):
         self._loading_paths: set[Path] = set()  # prevents duplicate load requests
         self._load_generation: int = 0
         self._pool_asset_index: dict[Path, tuple[int, list[Path]]] = {}
+        self._pool_path: Optional[Path] = None
+        self._filter: Optional[str] = None
 
         self.init_widgets()
         self.init_layouts()
@@ -83,6 +100,14 @@ class Viewport(QWidget):
             self.loader.load_asset(x, refresh=True)
 
         self.screenshot.created.connect(load)
+        self.dcc.preview_rendered.connect(self.on_preview_rendered)
+        if pool := self.dcc.render_pool:
+            pool.job_progress.connect(self.on_render_progress)
+
+        self.async_backup.progress.connect(self.on_backup_progress)
+        self.async_backup.finished.connect(lambda x, _: self.on_backup_done(x))
+        self.async_backup.cancelled.connect(self.on_backup_done)
+        self.async_backup.failed.connect(self.on_backup_failed)
 
     @property
     def widgets(self) -> dict[str, ViewportButton]:
@@ -163,14 +188,7 @@ class Viewport(QWidget):
                     self.flow_layout.addWidget(cached_widget)
                     continue
 
-                b = self.widgets.get(x.stem)
-                if not b:
-                    b = ViewportButton(x, (200, 200))
-                    b.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-                    b.customContextMenuRequested.connect(partial(self.on_context_menu, b))
-                    b.clicked.connect(partial(self.on_btn_click, x))
-                    self.widgets[x.stem] = b
-
+                b = self.widgets.get(x.stem) or self._create_button(x)
                 self.flow_layout.addWidget(b)
 
                 if x not in self._loading_paths or self._load_force:
@@ -181,6 +199,81 @@ class Viewport(QWidget):
 
         self._schedule_next_tick()
 
+    def _create_button(self, x: Path) -> ViewportButton:
+        # shift click selects several assets for batched imports
+        b = ViewportButton(x, (200, 200), checkable=True)
+        b.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        b.customContextMenuRequested.connect(partial(self.on_context_menu, b))
+        b.clicked.connect(partial(self.on_btn_click, x))
+        self.widgets[x.stem] = b
+        return b
+
+    def _widget_for(self, path: Path) -> Optional[ViewportButton]:
+        # buttons hold the asset folder until the asset is loaded, then its file
+        b = self.widgets.get(path.stem)
+        if b and path in (b.file, b.file.parent):
+            return b
+        return None
+
+    def _is_visible(self, path: Path) -> bool:
+        if path.parent != self._pool_path:
+            return False
+        return not self._filter or self._filter in path.stem.lower()
+
+    def _layout_index(self, path: Path) -> int:
+        key = path.stem.lower()
+        for i in range(self.flow_layout.count()):
+            item = self.flow_layout.itemAt(i)
+            w = item.widget() if item else None
+            if isinstance(w, ViewportButton) and w.name.lower() > key:
+                return i
+        return self.flow_layout.count()
+
+    def _update_index(self, pool: Path, add: Optional[Path], remove: Optional[Path]):
+        # keeps the scan cache valid so the next draw doesn't rescan the pool
+        cached = self._pool_asset_index.get(pool)
+        if not cached:
+            return
+
+        assets = [a for a in cached[1] if a not in (add, remove)]
+        if add:
+            bisect.insort(assets, add, key=lambda x: x.stem.lower())
+        self._pool_asset_index[pool] = (self._pool_mtime_ns(pool), assets)
+
+    def insert_asset(self, path: Path) -> None:
+        self._update_index(path.parent, path, None)
+        if not self._is_visible(path):
+            self.loader.remove_asset(path)
+            return
+
+        if not self._widget_for(path):
+            self.flow_layout.insertWidget(
+                self._layout_index(path), self._create_button(path)
+            )
+
+        self._loading_paths.add(path)
+        self.loader.load_asset(path, refresh=True)
+
+    def remove_asset(self, path: Path) -> None:
+        if b := self._widget_for(path):
+            self.flow_layout.removeWidget(b)
+            del self.widgets[path.stem]
+            b.setParent(None)
+            b.deleteLater()
+
+        if path in self._pending_assets:
+            self._pending_assets.remove(path)
+        self._loading_paths.discard(path)
+        self.loader.remove_asset(path)
+        if not path.exists():
+            self._update_index(path.parent, None, path)
+
+    def refresh_asset(self, path: Path) -> None:
+        if path.exists() and self.loader.is_asset(path):
+            self.insert_asset(path)
+        else:
+            self.remove_asset(path)
+
     def draw(
         self, path: Path, force: bool = False, filter: Optional[str] = None
     ) -> None:
@@ -192,8 +285,10 @@ class Viewport(QWidget):
             return
 
         self.curr_pool = path.parent
+        self._pool_path = path
 
         needle = filter.lower() if filter else None
+        self._filter = needle
 
         for x in self._get_pool_assets(path, force):
             if needle and needle not in x.stem.lower():
@@ -204,6 +299,11 @@ class Viewport(QWidget):
             self._start_incremental_load(force)
 
     def on_btn_click(self, x: Path):
+        b = self._widget_for(x)
+        if b and not b.is_selected():
+            for w in self.widgets.values():
+                w.set_selected(False)
+
         asset = self.loader.get_asset(x)
         if asset:
             self.asset_clicked.emit(asset)
@@ -232,10 +332,10 @@ class Viewport(QWidget):
         repath_act.triggered.connect(lambda: self.dcc.repath_textures(btn.file))
 
         if self.curr_view in ("models", "apic_models", "lightsets"):
-            import_act.triggered.connect(lambda: self.dcc.models_import(btn.file))
-            reference_act.triggered.connect(lambda: self.dcc.models_reference(btn.file))
+            import_act.triggered.connect(lambda: self.on_models_import(btn))
+            reference_act.triggered.connect(lambda: self.on_models_reference(btn))
         elif self.curr_view == "materials":
-            import_act.triggered.connect(lambda: self.dcc.materials_import(btn.file))
+            import_act.triggered.connect(lambda: self.on_materials_import(btn))
         elif self.curr_view == "hdris":
             import_act.setText("Import as Domelight")
             import_act.triggered.connect(lambda: self.dcc.hdri_import_as_dome(btn.file))
@@ -289,19 +389,85 @@ class Viewport(QWidget):
 
         menu.exec_(btn.mapToGlobal(point))
 
+    def selected_files(self, btn: ViewportButton) -> list[Path]:
+        if not btn.is_selected():
+            return [btn.file]
+        return [w.file for w in self.widgets.values() if w.is_selected()]
+
+    def on_models_import(self, btn: ViewportButton):
+        # several assets go to cinema 4d as one batch message
+        files = self.selected_files(btn)
+        if len(files) > 1:
+            self.dcc.models_import_all(files)
+        else:
+            self.dcc.models_import(btn.file)
+
+    def on_models_reference(self, btn: ViewportButton):
+        files = self.selected_files(btn)
+        if len(files) > 1:
+            self.dcc.models_reference_all(files)
+        else:
+            self.dcc.models_reference(btn.file)
+
+    def on_materials_import(self, btn: ViewportButton):
+        files = self.selected_files(btn)
+        if len(files) > 1:
+            self.dcc.materials_import_all(files)
+        else:
+            self.dcc.materials_import(btn.file)
+
     def on_render(self, btn: ViewportButton):
-        self.dcc.materials_preview_create(
-            btn.file,
-            callback=lambda: self.loader.load_asset(btn.file.parent, refresh=True),
-        )
+        self.dcc.materials_preview_create(btn.file)
+
+    def on_render_progress(self, _: int, output: str, done: int, total: int):
+        self.on_preview_rendered(output, done, total)
 
-    def on_backup(self, path: Path):
-        self.backup.create(path)
+    def on_preview_rendered(self, output: str, done: int, total: int):
+        # only the finished tile is reloaded, the rest of the grid stays as is
+        Logger.debug(f"rendered preview {done}/{total}: {output}")
+        if output:
+            self.loader.load_asset(Path(output).parent, refresh=True)
+
+    def on_backup(self, path: Path, open_after: bool = False):
+        # a scene that is already being backed up opens once that backup is done
+        if open_after:
+            self._open_after_backup.add(path)
+
+        task = self.async_backup.create(path)
+        if not task:
+            return
+
+        # non modal, the viewport stays usable while large scenes are backed up
+        prog = ProgressDialog(f"Backing up {path.name}...", 0, 100, self)
+        prog.setWindowModality(Qt.WindowModality.NonModal)
+        prog.canceled.connect(task.stop)
+        self._backup_progress[path] = prog
+        prog.show()
+
+    def on_backup_progress(self, path: Path, percent: int):
+        if prog := self._backup_progress.get(path):
+            prog.setValue(percent)
+
+    def _close_backup_progress(self, path: Path):
+        if prog := self._backup_progress.pop(path, None):
+            prog.close()
+
+    def on_backup_done(self, path: Path):
+        # a cancelled backup still opens the scene, the user chose to skip it
+        self._close_backup_progress(path)
+        if path in self._open_after_backup:
+            self._open_after_backup.discard(path)
+            self.dcc.file_open(path)
+
+    def on_backup_failed(self, path: Path):
+        self._close_backup_progress(path)
+        if path in self._open_after_backup:
+            self._open_after_backup.discard(path)
+            Logger.error(f"backup of {path.name} failed, not opening it")
 
     def on_open_dialog(self, path: Path):
         def on_backup_open(path: Path):
-            self.backup.create(path)
-            self.dcc.file_open(path)
+            self.on_backup(path, open_after=True)
 
         backup = CreateBackupDialog()
         backup.accepted.connect(lambda: on_backup_open(path))
@@ -317,10 +483,23 @@ class Viewport(QWidget):
             f.unlink()
         self.loader.load_asset(file_dir, refresh=True)
 
+    def _pool_entry(self, file: Path) -> Path:
+        # the asset folder, or the file itself for assets stored loose in the pool
+        return file if file.parent == self._pool_path else file.parent
+
     def delete_widget(self, btn: ViewportButton):
-        del self.widgets[btn.file.stem]
-        btn.setParent(None)
-        btn.deleteLater()
+        path = self._pool_entry(btn.file)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".jpg").unlink(missing_ok=True)
+
+        Logger.info(f"deleted asset {path.name}")
+        self.remove_asset(path)
+        # chunks only the deleted asset's backups used are freed
+        if self._pool_path:
+            self.async_backup.prune(self._pool_path)
 
     def shutdown(self):
         if self._load_timer:
@@ -336,7 +515,12 @@ class Viewport(QWidget):
         if not name or not btn.file.exists():
             return
 
-        new_asset = self.loader.rename_asset(btn.file.parent, name)
+        old_path = btn.file.parent
+        if self.async_backup.is_running(btn.file):
+            Logger.error(f"can't rename {btn.file.stem} while it is backed up")
+            return
+
+        new_asset = self.loader.rename_asset(old_path, name)
         if not new_asset:
             return
 
@@ -344,8 +528,6 @@ class Viewport(QWidget):
 
         self.backup.rename_from_asset(new_asset.path, name)
 
-        old_btn_key = btn.file.stem
-        del self.widgets[old_btn_key]
-        self.widgets[name] = btn
-
-        self.loader.load_asset(new_asset.path)
+        # the button is bound to the old path, replace it in place
+        self.remove_asset(old_path)
+        self.insert_asset(new_asset.path)
@@ -1,3 +1,5 @@
+from typing import Callable, Optional
+
 def exr_to_jpg(exr_path: str, jpg_path: str, resize_width: int) -> None: ...
 def hdr_to_jpg(hdr_path: str, jpg_path: str, resize_width: int) -> None: ...
 def sdr_to_jpg(path: str, jpg_path: str, resize_width: int) -> None: ...
@@ -5,3 +7,10 @@ def apply_srgb_gamma(path: str) -> None: ...
 def screenshot(
     output: str, x: int, y: int, width: int, height: int, resize_width: int
 ) -> None: ...
+def cdc_chunks(
+    path: str,
+    min_size: int,
+    avg_size: int,
+    max_size: int,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> list[tuple[int, int]]: ...
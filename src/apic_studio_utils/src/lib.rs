@@ -12,6 +12,7 @@ use image::{DynamicImage, ImageBuffer, Rgb, Rgba};
 use pyo3::prelude::*;
 use std::fs::File;
 use std::io::BufReader;
+use std::io::Read;
 use xcap;
 
 #[pyfunction]
@@ -266,6 +267,79 @@ fn apply_srgb_gamma(file: &str) -> PyResult<()> {
     Ok(())
 }
 
+// must match GEAR_SEED and the splitmix64 table in services/chunk_store.py
+const GEAR_SEED: u64 = 0x6170_6963_7374_7564;
+
+fn gear_table() -> [u64; 256] {
+    let mut table = [0u64; 256];
+    let mut state = GEAR_SEED;
+    for v in table.iter_mut() {
+        state = state.wrapping_add(0x9E37_79B9_7F4A_7C15);
+        let mut z = state;
+        z = (z ^ (z >> 30)).wrapping_mul(0xBF58_476D_1CE4_E5B9);
+        z = (z ^ (z >> 27)).wrapping_mul(0x94D0_49BB_1331_11EB);
+        *v = z ^ (z >> 31);
+    }
+    table
+}
+
+#[pyfunction]
+#[pyo3(signature = (path, min_size, avg_size, max_size, progress=None))]
+fn cdc_chunks(
+    py: Python<'_>,
+    path: &str,
+    min_size: usize,
+    avg_size: usize,
+    max_size: usize,
+    progress: Option<Bound<'_, PyAny>>,
+) -> PyResult<Vec<(u64, u64)>> {
+    let gear = gear_table();
+    let bits = usize::BITS - 1 - avg_size.max(2).leading_zeros();
+    let mask: u64 = ((1u64 << bits) - 1) << (64 - bits);
+
+    let mut file = File::open(path)?;
+    let total = file.metadata()?.len();
+    let mut buf = vec![0u8; 4 * 1024 * 1024];
+    let mut chunks = Vec::new();
+    let (mut start, mut length, mut h) = (0u64, 0usize, 0u64);
+    let mut done = 0u64;
+    loop {
+        // other python threads keep running while a block is read and hashed
+        let n = py.detach(|| -> std::io::Result<usize> {
+            let n = file.read(&mut buf)?;
+            for &b in &buf[..n] {
+                length += 1;
+                // bytes below the minimum chunk size can't end a chunk
+                if length < min_size {
+                    continue;
+                }
+                h = (h << 1).wrapping_add(gear[b as usize]);
+                if h & mask == 0 || length >= max_size {
+                    chunks.push((start, length as u64));
+                    start += length as u64;
+                    length = 0;
+                    h = 0;
+                }
+            }
+            Ok(n)
+        })?;
+        if n == 0 {
+            break;
+        }
+
+        // an exception raised by the callback cancels the chunking
+        done += n as u64;
+        if let Some(progress) = &progress {
+            progress.call1((done, total))?;
+        }
+    }
+    if length > 0 {
+        chunks.push((start, length as u64));
+    }
+
+    Ok(chunks)
+}
+
 #[pymodule]
 fn rust_thumbnails(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(exr_to_jpg, m)?)?;
@@ -273,6 +347,7 @@ fn rust_thumbnails(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(sdr_to_jpg, m)?)?;
     m.add_function(wrap_pyfunction!(screenshot, m)?)?;
     m.add_function(wrap_pyfunction!(apply_srgb_gamma, m)?)?;
+    m.add_function(wrap_pyfunction!(cdc_chunks, m)?)?;
     Ok(())
 }
 
@@ -1,7 +1,6 @@
 import importlib
 import sys
 from pathlib import Path
-from queue import Empty, Queue
 
 import c4d
 from c4d.threading import C4DThread
@@ -10,12 +9,17 @@ sys.path.append(str(Path(__file__).parent / "apic_connector"))
 sys.path.append(str(Path(__file__).parent / "shared"))
 
 from apic_connector import c4d as routers
+from apic_connector.c4d.services import core
+from apic_connector.message_queue import MessageQueue
+from apic_connector.scene_watcher import SceneWatcher
 from shared.logger import Logger
 from shared.messaging import Message, MessageRouter
-from shared.network import Connection, Server
+from shared.network import Connection, Server, transfer_router
 
 thread = None
 PLUGIN_ID = 13371337
+FALLBACK_TIMER_MS = 1000
+TICK_BUDGET_S = 0.03
 
 
 class ServerThread(C4DThread):
@@ -31,29 +35,43 @@ class ServerThread(C4DThread):
         super().End(wait)
 
 
+def wakeup_main_thread() -> None:
+    c4d.SpecialEventAdd(PLUGIN_ID)
+
+
 class TimerMessage(c4d.plugins.MessageData):
-    def __init__(self, queue: Queue[tuple[Connection, Message]], router: MessageRouter):
+    def __init__(
+        self, queue: MessageQueue, router: MessageRouter, watcher: SceneWatcher
+    ):
         super().__init__()
         self.queue = queue
         self.router = router
+        self.watcher = watcher
 
     def GetTimer(self) -> int:
-        return 200
+        # the server thread wakes us through SpecialEventAdd, polling is only a fallback
+        return FALLBACK_TIMER_MS
 
     def CoreMessage(self, id: int, bc: c4d.BaseContainer):
-        if id == c4d.MSG_TIMER:
+        if id in (PLUGIN_ID, c4d.MSG_TIMER):
             self.process_queue()
+            self.watcher.check()
+        elif id == c4d.EVMSG_CHANGE:
+            self.watcher.mark_dirty()
+            self.watcher.check()
 
         return True
 
     def process_queue(self):
-        while True:
-            try:
-                conn, message = self.queue.get_nowait()
-            except Empty:
-                break
+        self.queue.process(self.serve, TICK_BUDGET_S)
 
+    def serve(self, item: tuple[Connection, Message]):
+        conn, message = item
+        try:
             self.router.serve(conn, message)
+        except Exception as e:
+            Logger.exception(e)
+            conn.send(Message("error", str(e)))
 
 
 def PluginMessage(id: int, _) -> bool:
@@ -103,21 +121,23 @@ def main() -> None:
         return None
 
     router = (
-        MessageRouter()
+        MessageRouter(batch_scope=core.coalesced_events)
         .include_router(routers.core_router)
         .include_router(routers.models_router)
         .include_router(routers.material_router)
         .include_router(routers.hdri_router)
+        .include_router(routers.scene_router)
+        .include_router(transfer_router)
     )
 
-    queue: Queue[tuple[Connection, Message]] = Queue()
+    queue = MessageQueue(wakeup_main_thread)
 
     if not c4d.plugins.FindPlugin(PLUGIN_ID):
         c4d.plugins.RegisterMessagePlugin(
             id=PLUGIN_ID,
             str="Apic Studio Connector",
             info=0,
-            dat=TimerMessage(queue, router),
+            dat=TimerMessage(queue, router, routers.scene_watcher),
         )
 
     thread = ServerThread(Server(router=router, msg_queue=queue))
@@ -1,3 +1,19 @@
-from .message import Message, MessageRouter, MsgHandlerFunc
+from .message import (
+    BATCH_MESSAGE,
+    Message,
+    MessageCapture,
+    MessageRouter,
+    MsgHandlerFunc,
+)
+from .metrics import Histogram, Metrics, metrics
 
-__all__ = ["Message", "MessageRouter", "MsgHandlerFunc"]
+__all__ = [
+    "BATCH_MESSAGE",
+    "Histogram",
+    "Message",
+    "MessageCapture",
+    "MessageRouter",
+    "Metrics",
+    "MsgHandlerFunc",
+    "metrics",
+]
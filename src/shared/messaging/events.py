@@ -0,0 +1,11 @@
+DOCUMENT_EVENT = "event.document.changed"
+MATERIALS_EVENT = "event.materials.changed"
+OBJECTS_EVENT = "event.objects.changed"
+SELECTION_EVENT = "event.selection.changed"
+
+# snapshot key -> event that carries its updated list
+SCENE_EVENTS = {
+    "materials": MATERIALS_EVENT,
+    "objects": OBJECTS_EVENT,
+    "selection": SELECTION_EVENT,
+}
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import json
+import time
 from collections import defaultdict
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import asdict, dataclass
 from functools import wraps
 from typing import TYPE_CHECKING, Any, Callable, Optional, Self
 
+from .metrics import HANDLER_TIME, RESPONSE_BYTES, metrics
+
 if TYPE_CHECKING:
     from ..network import Connection
 
@@ -15,8 +19,11 @@ class Message:
     message: str
     data: Optional[Any] = None
 
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
     def as_json(self, encoding: str = "utf-8") -> bytes:
-        message = asdict(self)
+        message = self.as_dict()
         return json.dumps(message).encode(encoding)
 
     @staticmethod
@@ -25,25 +32,94 @@ class Message:
 
 
 MsgHandlerFunc = Callable[["Connection", Message], None]
+BatchScope = Callable[[], AbstractContextManager[Any]]
+
+BATCH_MESSAGE = "batch"
+
+
+class MessageCapture:
+    def __init__(self) -> None:
+        self.messages: list[Message] = []
+        self.bytes_sent = 0
+
+    def send(self, data: bytes | Message) -> Self:
+        if isinstance(data, Message):
+            self.messages.append(data)
+            self.bytes_sent += len(data.as_json())
+        else:
+            self.messages.append(Message.from_dict(json.loads(data)))
+            self.bytes_sent += len(data)
+
+        return self
+
+    @property
+    def result(self) -> Message:
+        if not self.messages:
+            return Message("error", "no response")
+
+        return self.messages[-1]
 
 
 class MessageRouter:
-    def __init__(self, prefix: str = ""):
+    def __init__(self, prefix: str = "", batch_scope: Optional[BatchScope] = None):
         self.prefix = prefix
         self.routes: dict[str, list[MsgHandlerFunc]] = defaultdict(list)
+        self.inline_routes: set[str] = set()
+        self.batch_scope = batch_scope
+
+    def is_inline(self, message: str) -> bool:
+        return message in self.inline_routes
 
     def serve(self, ctx: Connection, message: Message):
-        routes = self.routes.get(message.message)
-        if not routes:
+        route = message.message
+        if route != BATCH_MESSAGE and route not in self.routes:
             ctx.send(Message("unregistered message"))
             return
 
-        for handler in routes:
-            handler(ctx, message)
+        start = time.perf_counter()
+        sent = ctx.bytes_sent
+        try:
+            if route == BATCH_MESSAGE:
+                self.serve_batch(ctx, message)
+            else:
+                for handler in self.routes[route]:
+                    handler(ctx, message)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            metrics.observe(route, HANDLER_TIME, elapsed)
+            metrics.observe(route, RESPONSE_BYTES, ctx.bytes_sent - sent)
+
+    def serve_batch(self, ctx: Connection, message: Message):
+        if not isinstance(message.data, list):
+            ctx.send(Message("error", "batch expects a list of messages"))
+            return
 
-    def register(self, message: str) -> Callable[[MsgHandlerFunc], MsgHandlerFunc]:
+        results: list[dict[str, Any]] = []
+        scope = self.batch_scope() if self.batch_scope else nullcontext()
+        with scope:
+            for data in message.data:
+                capture = MessageCapture()
+                try:
+                    sub_message = Message.from_dict(data)
+                    if sub_message.message == BATCH_MESSAGE:
+                        raise ValueError("nested batch messages are not supported")
+                    self.serve(capture, sub_message)  # type: ignore
+                except Exception as e:
+                    capture.send(Message("error", str(e)))
+
+                results.append(capture.result.as_dict())
+
+        ctx.send(Message(BATCH_MESSAGE, results))
+
+    def register(
+        self, message: str, inline: bool = False
+    ) -> Callable[[MsgHandlerFunc], MsgHandlerFunc]:
+        # inline routes are served on the network thread instead of the dcc queue,
+        # they must not touch the dcc api
         def decorator(fn: MsgHandlerFunc) -> MsgHandlerFunc:
             self.routes[self.prefix + message].append(fn)
+            if inline:
+                self.inline_routes.add(self.prefix + message)
 
             @wraps(fn)
             def wrapper(ctx: Connection, msg: Message):
@@ -56,5 +132,6 @@ class MessageRouter:
     def include_router(self, sub_router: MessageRouter) -> Self:
         for k, v in sub_router.routes.items():
             self.routes[k].extend(v)
+        self.inline_routes.update(sub_router.inline_routes)
 
         return self
@@ -0,0 +1,78 @@
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any
+
+QUEUE_WAIT = "queue_wait_ms"
+HANDLER_TIME = "handler_ms"
+ROUND_TRIP = "round_trip_ms"
+REQUEST_BYTES = "request_bytes"
+RESPONSE_BYTES = "response_bytes"
+
+
+class Histogram:
+    MAX_SAMPLES = 1024
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        # a rolling window keeps percentiles recent and memory bounded
+        self.samples: deque[float] = deque(maxlen=self.MAX_SAMPLES)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, p: int) -> float:
+        if not self.samples:
+            return 0.0
+
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))
+        return ordered[idx]
+
+    def summary(self) -> dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+        for p in self.PERCENTILES:
+            summary[f"p{p}"] = self.percentile(p)
+
+        return summary
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._routes: dict[str, dict[str, Histogram]] = defaultdict(
+            lambda: defaultdict(Histogram)
+        )
+
+    def observe(self, route: str, name: str, value: float) -> None:
+        with self._lock:
+            self._routes[route][name].observe(value)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                route: {name: h.summary() for name, h in hists.items()}
+                for route, hists in self._routes.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+metrics = Metrics()
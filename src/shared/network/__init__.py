@@ -1,4 +1,15 @@
 from .connection import Connection
 from .server import ConnectionHandler, Server
+from .transfer import TransferClient, TransferStore
+from .transfer import router as transfer_router
+from .transfer import store as transfer_store
 
-__all__ = ["Connection", "ConnectionHandler", "Server"]
+__all__ = [
+    "Connection",
+    "ConnectionHandler",
+    "Server",
+    "TransferClient",
+    "TransferStore",
+    "transfer_router",
+    "transfer_store",
+]
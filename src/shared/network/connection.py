@@ -3,20 +3,128 @@ from __future__ import annotations
 import json
 import select
 import socket
-from typing import Any, Callable, Optional, Self
+import zlib
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional, Self
 
 from shared.logger import Logger
 from shared.messaging.message import Message
 
+HELLO_MESSAGE = "core.hello"
+COMPRESSION_ZLIB = "zlib"
+SUPPORTED_COMPRESSION = (COMPRESSION_ZLIB,)
+
+FLAG_COMPRESSED = 1 << 31
+FLAG_CONTROL = 1 << 30
+LENGTH_MASK = FLAG_CONTROL - 1
+
+HEARTBEAT_PING = b"ping"
+HEARTBEAT_PONG = b"pong"
+
+EVENT_PREFIX = "event."
+
 
 class Connection:
+    COMPRESS_THRESHOLD = 1024
+    COMPRESS_LEVEL = 6
+    KEEPALIVE_IDLE = 10
+    KEEPALIVE_INTERVAL = 3
+    KEEPALIVE_COUNT = 3
+
     def __init__(self, socket: socket.socket, timeout: Optional[float] = None) -> None:
         self.socket = socket
 
         self.timeout = timeout
         self._on_connect: list[Callable[[], None]] = []
         self._on_disconnect: list[Callable[[], None]] = []
+        self._on_event: list[Callable[[Message], None]] = []
         self.is_connected = False
+        self.compression: Optional[str] = None
+        self.heartbeat_supported = False
+        self._recv_buffer = bytearray()
+        self._frame_buffer = bytearray()
+        self._in_flight = 0
+        self._late_replies = 0
+        self._send_lock = Lock()
+        self.bytes_sent = 0
+
+    def enable_keepalive(self) -> None:
+        sock = self.socket
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                sock.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.KEEPALIVE_IDLE
+                )
+                sock.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, self.KEEPALIVE_INTERVAL
+                )
+                sock.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_KEEPCNT, self.KEEPALIVE_COUNT
+                )
+            elif hasattr(socket, "SIO_KEEPALIVE_VALS"):
+                sock.ioctl(  # type: ignore
+                    socket.SIO_KEEPALIVE_VALS,  # type: ignore
+                    (1, self.KEEPALIVE_IDLE * 1000, self.KEEPALIVE_INTERVAL * 1000),
+                )
+            elif hasattr(socket, "TCP_KEEPALIVE"):
+                sock.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, self.KEEPALIVE_IDLE
+                )
+        except OSError as e:
+            Logger.warning(f"failed to enable tcp keepalive: {e}")
+
+    def encode_frame(self, data: bytes) -> bytes:
+        flags = 0
+        compress = self.compression == COMPRESSION_ZLIB
+        if compress and len(data) >= self.COMPRESS_THRESHOLD:
+            compressed = zlib.compress(data, self.COMPRESS_LEVEL)
+            if len(compressed) < len(data):
+                data = compressed
+                flags |= FLAG_COMPRESSED
+
+        header = (len(data) | flags).to_bytes(4, "big")
+        return header + data
+
+    @staticmethod
+    def decode_frame(header: int, body: bytes) -> bytes:
+        if header & FLAG_COMPRESSED:
+            return zlib.decompress(body)
+
+        return body
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._recv_buffer.extend(data)
+
+        frames: list[bytes] = []
+        while len(self._recv_buffer) >= 4:
+            header = int.from_bytes(self._recv_buffer[:4], "big")
+            body_size = header & LENGTH_MASK
+            if len(self._recv_buffer) < 4 + body_size:
+                break
+
+            body = bytes(self._recv_buffer[4 : 4 + body_size])
+            del self._recv_buffer[: 4 + body_size]
+            if header & FLAG_CONTROL:
+                self._handle_control(body)
+                continue
+
+            frames.append(self.decode_frame(header, body))
+
+        return frames
+
+    def _send_control(self, payload: bytes) -> None:
+        header = (len(payload) | FLAG_CONTROL).to_bytes(4, "big")
+        with self._send_lock:
+            self.socket.sendall(header + payload)
+
+    def _handle_control(self, payload: bytes) -> None:
+        if payload == HEARTBEAT_PING:
+            try:
+                self._send_control(HEARTBEAT_PONG)
+            except OSError:
+                Logger.error("failed to answer heartbeat, socket is already closed")
 
     def send(self, data: bytes | Message) -> Self:
         if isinstance(data, Message):
@@ -25,9 +133,12 @@ class Connection:
         else:
             Logger.debug(f"sending message: {len(data)} bytes")
 
-        header = len(data).to_bytes(4, "big")
+        frame = self.encode_frame(data)
         try:
-            self.socket.sendall(header + data)
+            with self._send_lock:
+                self.socket.sendall(frame)
+                self.bytes_sent += len(frame)
+                self._in_flight += 1
         except OSError:
             Logger.error("failed to send message, socket is already closed")
         except Exception as e:
@@ -40,34 +151,167 @@ class Connection:
         response = self.recv()
         return response
 
-    def recv(self) -> dict[str, Any]:
-        ready, _, _ = select.select([self.socket], [], [], self.timeout)
-        if not ready:
-            Logger.warning(f"recv() timed out after {self.timeout}s")
-            raise TimeoutError(f"no data in {self.timeout}s")
+    def _fill(self, size: int) -> None:
+        while len(self._frame_buffer) < size:
+            ready, _, _ = select.select([self.socket], [], [], self.timeout)
+            if not ready:
+                Logger.warning(f"recv() timed out after {self.timeout}s")
+                raise TimeoutError(f"no data in {self.timeout}s")
+
+            chunk = self.socket.recv(size - len(self._frame_buffer))
+            if not chunk:
+                raise ConnectionError("connection closed by peer")
+            self._frame_buffer.extend(chunk)
 
-        header = self.socket.recv(4)
-        body_size = int.from_bytes(header, "big")
-        response = self.socket.recv(body_size).decode("utf-8")
+    def _recv_frame(self) -> tuple[int, bytes]:
+        # partial frames stay buffered, a timeout doesn't desync the stream
+        self._fill(4)
+        header = int.from_bytes(self._frame_buffer[:4], "big")
+        size = 4 + (header & LENGTH_MASK)
+        self._fill(size)
+        body = bytes(self._frame_buffer[4:size])
+        del self._frame_buffer[:size]
+        return header, body
+
+    def _drop_late_reply(self, rjson: dict[str, Any]) -> bool:
+        if not self._late_replies:
+            return False
+
+        self._late_replies -= 1
+        Logger.warning(f"dropped late reply: {rjson.get('message')}")
+        return True
+
+    def _handle_frame(self, header: int, body: bytes) -> Optional[dict[str, Any]]:
+        if header & FLAG_CONTROL:
+            self._handle_control(body)
+            return None
+
+        response = self.decode_frame(header, body).decode("utf-8")
 
         try:
             rjson = json.loads(response)
         except json.JSONDecodeError as e:
             Logger.error("failed to decode message")
             raise e
-        except TimeoutError:
-            Logger.error("message timed out")
-            return {}
+
+        # events are pushed by the connector and can arrive before any reply
+        if rjson.get("message", "").startswith(EVENT_PREFIX):
+            self._dispatch_event(Message.from_dict(rjson))
+            return None
 
         Logger.debug(f"receiving message: {rjson.get('message')}")
         return rjson
 
+    def _dispatch_event(self, event: Message) -> None:
+        Logger.debug(f"receiving event: {event.message}")
+        for fn in self._on_event:
+            try:
+                fn(event)
+            except Exception as e:
+                Logger.exception(e)
+
+    def recv(self) -> dict[str, Any]:
+        try:
+            while True:
+                rjson = self._handle_frame(*self._recv_frame())
+                if rjson is None or self._drop_late_reply(rjson):
+                    continue
+
+                self._in_flight = max(0, self._in_flight - 1)
+                return rjson
+        except TimeoutError:
+            # replies still in flight belong to requests the caller gave up on
+            self._late_replies += self._in_flight
+            self._in_flight = 0
+            raise
+
+    def poll(self) -> None:
+        while self.is_connected:
+            ready, _, _ = select.select([self.socket], [], [], 0)
+            if not ready:
+                return
+
+            rjson = self._handle_frame(*self._recv_frame())
+            if rjson is not None and not self._drop_late_reply(rjson):
+                Logger.warning(f"dropped unexpected message: {rjson.get('message')}")
+
+    @contextmanager
+    def request_timeout(self, timeout: Optional[float]) -> Iterator[None]:
+        prev_timeout = self.timeout
+        self.timeout = timeout or prev_timeout
+        try:
+            yield
+        finally:
+            self.timeout = prev_timeout
+
+    def heartbeat(self, timeout: Optional[float] = None) -> bool:
+        if not self.heartbeat_supported:
+            return self.is_connected
+
+        try:
+            with self.request_timeout(timeout):
+                self._send_control(HEARTBEAT_PING)
+                while True:
+                    header, body = self._recv_frame()
+                    if header & FLAG_CONTROL and body == HEARTBEAT_PONG:
+                        return True
+                    rjson = self._handle_frame(header, body)
+                    if rjson is not None and not self._drop_late_reply(rjson):
+                        Logger.warning(
+                            "dropped unexpected reply while awaiting heartbeat"
+                        )
+        except OSError as e:
+            Logger.warning(f"heartbeat failed: {e}")
+            return False
+
+    def negotiate(self) -> None:
+        self.compression = None
+        self.heartbeat_supported = False
+        hello = Message(
+            HELLO_MESSAGE,
+            {"compression": list(SUPPORTED_COMPRESSION), "heartbeat": True},
+        )
+        try:
+            res = Message.from_dict(self.send_recv(hello))
+        except Exception as e:
+            Logger.warning(f"protocol negotiation failed: {e}")
+            return
+
+        if res.message != "hello" or not isinstance(res.data, dict):
+            Logger.debug("connector does not support protocol negotiation")
+            return
+
+        compression = res.data.get("compression")
+        if compression in SUPPORTED_COMPRESSION:
+            self.compression = compression
+            Logger.debug(f"negotiated {compression} compression")
+
+        self.heartbeat_supported = bool(res.data.get("heartbeat"))
+
+    def accept_hello(self, message: Message) -> None:
+        data = message.data if isinstance(message.data, dict) else {}
+        offered = data.get("compression", [])
+        offered_heartbeat = data.get("heartbeat", False)
+        compression = next((c for c in offered if c in SUPPORTED_COMPRESSION), None)
+
+        # reply uncompressed, the peer enables compression once it reads it
+        reply = Message("hello", {"compression": compression, "heartbeat": True})
+        self.send(reply)
+        self.compression = compression
+        self.heartbeat_supported = bool(offered_heartbeat)
+
     def close(self) -> None:
         try:
             self.socket.close()
         except Exception:
             pass
         self.is_connected = False
+        self.compression = None
+        self.heartbeat_supported = False
+        self._recv_buffer.clear()
+        self._frame_buffer.clear()
+        self._in_flight = 0
+        self._late_replies = 0
 
     def status(self) -> bool:
         msg = Message("core.status")
@@ -97,31 +341,34 @@ class Connection:
         for c in self._on_disconnect:
             c()
 
-    def connect(self, address: tuple[str, int]) -> Self:
-        Logger.info("connecting to apic studio connector...")
+    def connect(self, address: tuple[str, int], quiet: bool = False) -> Self:
+        log = Logger.debug if quiet else Logger.info
+        log("connecting to apic studio connector...")
         if self.is_connected and self.status():
             return self
 
+        was_connected = self.is_connected
+
+        # a socket can only be connected once, every attempt starts from a fresh one
+        self.close()
+        self.socket = self.client_connection().socket
+
         try:
+            self.socket.settimeout(self.timeout)
             self.socket.connect(address)
-        except ConnectionRefusedError:
-            self._disconnect()
-            Logger.error(
-                f"connection refused, disconnecting from socket {address}, apic studio connector is not available"
-            )
-            return self
+            self.socket.settimeout(None)
+            self.enable_keepalive()
         except OSError as e:
-            Logger.exception(e)
             self.close()
-            self.socket = self.client_connection().socket
-            return self.connect(address)
-        except Exception as e:
-            Logger.exception(e)
-            self._disconnect()
+            log = Logger.debug if quiet else Logger.error
+            log(f"apic studio connector is not available at {address}: {e}")
+            if was_connected:
+                self._disconnect()
             return self
 
         Logger.info("connected to apic studio connector")
         self.is_connected = True
+        self.negotiate()
         for c in self._on_connect:
             c()
 
@@ -133,6 +380,9 @@ class Connection:
     def on_disconnect(self, fn: Callable[[], None]) -> None:
         self._on_disconnect.append(fn)
 
+    def on_event(self, fn: Callable[[Message], None]) -> None:
+        self._on_event.append(fn)
+
     @classmethod
     def client_connection(cls, timeout: Optional[float] = None) -> Connection:
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -151,7 +401,7 @@ class Connection:
             Logger.error("failed to create server socket")
             return None
 
-        server_socket.listen(1)
+        server_socket.listen(socket.SOMAXCONN)
         server_socket.settimeout(1.0)
         return Connection(server_socket, timeout=timeout)
 
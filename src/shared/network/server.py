@@ -1,12 +1,19 @@
+import json
+import selectors
 import socket
-from queue import Queue
-from threading import Thread
+from queue import Full, Queue
 from typing import Optional
 
 from shared.logger import Logger
-from shared.messaging import Message, MessageRouter
+from shared.messaging import Message, MessageRouter, metrics
+from shared.messaging.metrics import REQUEST_BYTES
 
 from . import Connection
+from .connection import HELLO_MESSAGE
+
+BUSY_RETRY_AFTER = 0.5
+SELECT_TIMEOUT = 1.0
+RECV_SIZE = 65536
 
 
 class ConnectionHandler:
@@ -21,30 +28,73 @@ class ConnectionHandler:
         self.msg_queue = msg_queue
         self._is_running = True
 
-        ip, port = connection.socket.getpeername()
-        self.client_ip = f"{ip}:{port}"
+        try:
+            ip, port = connection.socket.getpeername()
+            self.client_ip = f"{ip}:{port}"
+        except OSError:
+            self.client_ip = "unknown"
 
         Logger.info(f"client: {self.client_ip} connected")
 
-    def handle_message(self, message: Message) -> None:
-        if self.msg_queue:
-            self.msg_queue.put((self.connection, message))
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+
+    def handle_message(self, message: Message, size: int = 0) -> None:
+        if message.message == HELLO_MESSAGE:
+            self.connection.accept_hello(message)
+            return
+
+        metrics.observe(message.message, REQUEST_BYTES, size)
+
+        if self.msg_queue and not self.router.is_inline(message.message):
+            try:
+                self.msg_queue.put_nowait((self.connection, message))
+            except Full:
+                Logger.warning(
+                    f"message queue full, rejecting {message.message} from {self.client_ip}"
+                )
+                self.connection.send(
+                    Message(
+                        "busy",
+                        {"message": message.message, "retry_after": BUSY_RETRY_AFTER},
+                    )
+                )
             return
 
         self.router.serve(self.connection, message)
 
-    def run(self) -> None:
-        while self._is_running:
+    def on_readable(self) -> bool:
+        try:
+            data = self.connection.socket.recv(RECV_SIZE)
+        except OSError:
+            return False
+
+        if not data:
+            return False
+
+        for frame in self.connection.feed(data):
             try:
-                data = self.connection.recv()
-            except Exception:
-                self.stop()
-                break
+                message = Message.from_dict(json.loads(frame))
+            except (json.JSONDecodeError, KeyError, TypeError):
+                Logger.error(f"failed to decode message from {self.client_ip}")
+                continue
+
+            # a bad request fails on its own, the connection stays usable
+            try:
+                self.handle_message(message, len(frame))
+            except Exception as e:
+                Logger.exception(e)
+                self.connection.send(
+                    Message("error", f"failed to handle {message.message}: {e}")
+                )
 
-            message = Message(**data)
-            self.handle_message(message)
+        return True
 
     def stop(self):
+        if not self._is_running:
+            return
+
         self.connection.close()
         self._is_running = False
         Logger.info(f"client {self.client_ip} disconnected")
@@ -64,9 +114,11 @@ class Server:
         self.router = router
         self.timeout = socket_timeout
         self._running = False
+        self._serving = False
         self.msg_queue = msg_queue
-        self.handlers: list[ConnectionHandler] = []
+        self.handlers: set[ConnectionHandler] = set()
         self.socket: Optional[Connection] = None
+        self.selector: Optional[selectors.BaseSelector] = None
 
     def run(self):
         self._running = True
@@ -77,29 +129,80 @@ class Server:
             Logger.error("oops")
             return
 
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket.socket, selectors.EVENT_READ)
+
         Logger.info(f"connection server listening on {self.addr}:{self.port}")
 
-        while self._running:
-            try:
-                sock = self.socket.accept()
-            except socket.timeout:
-                continue
-            except Exception:
-                self.stop()
+        self._serving = True
+        try:
+            while self._running:
+                for key, _ in self.selector.select(timeout=SELECT_TIMEOUT):
+                    if key.data is None:
+                        self._accept()
+                    else:
+                        self._read(key.data)
+        except Exception as e:
+            Logger.exception(e)
+        finally:
+            self._serving = False
+            self._close()
+
+    def _accept(self) -> None:
+        if not self.socket or not self.selector:
+            return
+
+        try:
+            sock = self.socket.accept()
+        except (socket.timeout, BlockingIOError):
+            return
+        except OSError as e:
+            Logger.error(f"failed to accept client: {e}")
+            return
+
+        conn = Connection(sock)
+        conn.is_connected = True
+        conn.enable_keepalive()
+        handler = ConnectionHandler(conn, self.router, self.msg_queue)
+        self.handlers.add(handler)
+        self.selector.register(sock, selectors.EVENT_READ, handler)
+
+    def _read(self, handler: ConnectionHandler) -> None:
+        # an error only drops its own client, the others keep being served
+        try:
+            if handler.on_readable():
                 return
+        except Exception as e:
+            Logger.error(f"dropping client {handler.client_ip}")
+            Logger.exception(e)
 
-            conn = Connection(sock)
-            conn_handler = ConnectionHandler(conn, self.router, self.msg_queue)
-            self.handlers.append(conn_handler)
-            Thread(target=conn_handler.run).start()
+        self._remove(handler)
+
+    def _remove(self, handler: ConnectionHandler) -> None:
+        if self.selector:
+            try:
+                self.selector.unregister(handler.connection.socket)
+            except (KeyError, ValueError):
+                pass
+
+        handler.stop()
+        self.handlers.discard(handler)
+
+    def _close(self) -> None:
+        for h in list(self.handlers):
+            self._remove(h)
+
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+
+        if self.socket:
+            self.socket.close()
 
     def stop(self):
         Logger.info("stopping connection server")
         self._running = False
-        for h in self.handlers:
-            h.stop()
-
-        if not self.socket:
-            return
 
-        self.socket.close()
+        # the event loop cleans up after its current select() returns
+        if not self._serving:
+            self._close()
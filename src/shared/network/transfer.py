@@ -0,0 +1,419 @@
+import base64
+import hashlib
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from shared.logger import Logger
+from shared.messaging import Message, MessageRouter
+
+from .connection import Connection
+
+CHUNK_SIZE = 256 * 1024
+WINDOW_SIZE = 8
+TRANSFER_DIR = Path(tempfile.gettempdir()) / "apic_studio" / "transfers"
+TRANSFER_MESSAGE = "transfer"
+
+ProgressFunc = Callable[[int, int], None]
+
+# hashing a multi-GB file on the selector thread would stall every client
+hash_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="apic-transfer")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _non_negative(value: Any, name: str) -> int:
+    # json ints only, int() would also accept floats and numeric strings
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"invalid {name}: {value!r}")
+
+    return value
+
+
+def encode_chunk(data: bytes) -> dict[str, Any]:
+    return {"data": base64.b64encode(data).decode("ascii"), "crc32": zlib.crc32(data)}
+
+
+def decode_chunk(chunk: dict[str, Any]) -> bytes:
+    data = base64.b64decode(chunk["data"])
+    if zlib.crc32(data) != chunk["crc32"]:
+        raise ValueError("chunk checksum mismatch")
+
+    return data
+
+
+class TransferStore:
+    def __init__(self, root: Path = TRANSFER_DIR) -> None:
+        self.root = root
+        # clients may only download from here and from directories the
+        # connector exported into
+        self.download_roots: set[Path] = {root.resolve()}
+        # uploads are hashed as their chunks arrive: id -> (size, digest)
+        self._digests: dict[str, tuple[int, Any]] = {}
+        # download sources: path -> (size, mtime_ns, sha256)
+        self._hashes: dict[Path, tuple[int, int, str]] = {}
+
+    def allow_download(self, root: Path) -> None:
+        self.download_roots.add(root.resolve())
+
+    def download_path(self, path: str) -> Path:
+        if not isinstance(path, str):
+            raise ValueError(f"invalid path: {path!r}")
+
+        resolved = Path(path).resolve()
+        if not any(resolved.is_relative_to(r) for r in self.download_roots):
+            raise PermissionError(f"{path} is outside of the download roots")
+
+        return resolved
+
+    def _validate_id(self, transfer_id: str) -> str:
+        # the id doubles as a file name, only accept sha256 hex digests
+        if not isinstance(transfer_id, str):
+            raise ValueError(f"invalid transfer id: {transfer_id!r}")
+        is_hex = all(c in "0123456789abcdef" for c in transfer_id)
+        if len(transfer_id) != 64 or not is_hex:
+            raise ValueError(f"invalid transfer id: {transfer_id}")
+
+        return transfer_id
+
+    def part_path(self, transfer_id: str) -> Path:
+        return self.root / f"{self._validate_id(transfer_id)}.part"
+
+    def target_path(self, transfer_id: str, name: str) -> Path:
+        if not isinstance(name, str):
+            raise ValueError(f"invalid file name: {name!r}")
+        return self.root / self._validate_id(transfer_id)[:16] / Path(name).name
+
+    def begin(self, name: str, size: int, sha256: str) -> dict[str, Any]:
+        target = self.target_path(sha256, name)
+        if target.exists() and target.stat().st_size == size:
+            return {"id": sha256, "offset": size, "path": str(target)}
+
+        part = self.part_path(sha256)
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.touch()
+
+        # a leftover part file lets an interrupted upload resume where it stopped
+        offset = part.stat().st_size
+        if offset > size:
+            part.write_bytes(b"")
+            offset = 0
+        if offset == 0:
+            self._digests[sha256] = (0, hashlib.sha256())
+
+        return {"id": sha256, "offset": offset}
+
+    def write(self, transfer_id: str, offset: int, data: bytes) -> int:
+        part = self.part_path(transfer_id)
+        current = part.stat().st_size
+        if offset != current:
+            raise ValueError(f"expected offset {current}, got {offset}")
+
+        with open(part, "ab") as f:
+            f.write(data)
+
+        # parts resumed from an earlier session are hashed once they're complete
+        entry = self._digests.pop(transfer_id, None)
+        if entry and entry[0] == current:
+            entry[1].update(data)
+            self._digests[transfer_id] = (current + len(data), entry[1])
+
+        return current + len(data)
+
+    def is_hashed(self, transfer_id: str) -> bool:
+        entry = self._digests.get(transfer_id)
+        try:
+            size = self.part_path(transfer_id).stat().st_size
+        except OSError:
+            return False
+        return entry is not None and entry[0] == size
+
+    def end(self, transfer_id: str, name: str) -> Path:
+        part = self.part_path(transfer_id)
+        entry = self._digests.pop(transfer_id, None)
+        size = part.stat().st_size
+        sha = entry[1].hexdigest() if entry and entry[0] == size else None
+        if (sha or file_sha256(part)) != transfer_id:
+            part.unlink()
+            raise ValueError("checksum mismatch, transfer discarded")
+
+        target = self.target_path(transfer_id, name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part, target)
+        return target
+
+    def download_info(
+        self, path: Path, cached: bool = False
+    ) -> Optional[dict[str, Any]]:
+        stat = path.stat()
+        entry = self._hashes.get(path)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return {"size": stat.st_size, "sha256": entry[2]}
+        if cached:
+            return None
+
+        sha = file_sha256(path)
+        self._hashes[path] = (stat.st_size, stat.st_mtime_ns, sha)
+        return {"size": stat.st_size, "sha256": sha}
+
+
+router = MessageRouter("transfer.")
+store = TransferStore()
+
+
+@router.register("upload.begin", inline=True)
+def upload_begin(conn: Connection, msg: Message):
+    data = msg.data or {}
+    try:
+        size = _non_negative(data["size"], "size")
+        res = store.begin(data["name"], size, data["sha256"])
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        conn.send(Message("error", f"failed to begin upload: {e}"))
+        return
+
+    conn.send(Message(TRANSFER_MESSAGE, res))
+
+
+@router.register("upload.chunk", inline=True)
+def upload_chunk(conn: Connection, msg: Message):
+    data = msg.data or {}
+    try:
+        offset = _non_negative(data["offset"], "offset")
+        offset = store.write(data["id"], offset, decode_chunk(data))
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        conn.send(Message("error", f"failed to write chunk: {e}"))
+        return
+
+    conn.send(Message(TRANSFER_MESSAGE, {"offset": offset}))
+
+
+@router.register("upload.end", inline=True)
+def upload_end(conn: Connection, msg: Message):
+    data = msg.data or {}
+    try:
+        transfer_id, name = data["id"], data["name"]
+        store.target_path(transfer_id, name)
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        conn.send(Message("error", f"failed to finish upload: {e}"))
+        return
+
+    def finish():
+        try:
+            path = store.end(transfer_id, name)
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            conn.send(Message("error", f"failed to finish upload: {e}"))
+            return
+
+        Logger.info(f"received file: {path}")
+        conn.send(Message(TRANSFER_MESSAGE, {"path": str(path)}))
+
+    # the client waits for the reply, other clients keep being served meanwhile
+    if store.is_hashed(transfer_id):
+        finish()
+    else:
+        hash_pool.submit(finish)
+
+
+@router.register("download.begin", inline=True)
+def download_begin(conn: Connection, msg: Message):
+    data = msg.data or {}
+    try:
+        path = store.download_path(data["path"])
+        res = store.download_info(path, cached=True)
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        conn.send(Message("error", f"failed to begin download: {e}"))
+        return
+
+    def describe():
+        try:
+            res = store.download_info(path)
+        except OSError as e:
+            conn.send(Message("error", f"failed to begin download: {e}"))
+            return
+
+        conn.send(Message(TRANSFER_MESSAGE, res))
+
+    if res:
+        conn.send(Message(TRANSFER_MESSAGE, res))
+    else:
+        hash_pool.submit(describe)
+
+
+@router.register("download.chunk", inline=True)
+def download_chunk(conn: Connection, msg: Message):
+    data = msg.data or {}
+    try:
+        offset = _non_negative(data["offset"], "offset")
+        size = _non_negative(data["size"], "size")
+        with open(store.download_path(data["path"]), "rb") as f:
+            f.seek(offset)
+            chunk = f.read(min(size, CHUNK_SIZE * 4))
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        conn.send(Message("error", f"failed to read chunk: {e}"))
+        return
+
+    conn.send(Message(TRANSFER_MESSAGE, encode_chunk(chunk)))
+
+
+class TransferClient:
+    def __init__(
+        self,
+        ctx: Connection,
+        chunk_size: int = CHUNK_SIZE,
+        window: int = WINDOW_SIZE,
+        retries: int = 3,
+    ) -> None:
+        self.ctx = ctx
+        self.chunk_size = chunk_size
+        self.window = window
+        self.retries = retries
+
+    def _call(self, message: str, data: dict[str, Any]) -> Optional[dict[str, Any]]:
+        res = Message.from_dict(self.ctx.send_recv(Message(message, data)))
+        if res.message != TRANSFER_MESSAGE or not isinstance(res.data, dict):
+            Logger.error(f"{message} failed: {res.data}")
+            return None
+
+        return res.data
+
+    def upload(
+        self, path: Path, progress: Optional[ProgressFunc] = None
+    ) -> Optional[str]:
+        size = path.stat().st_size
+        sha256 = file_sha256(path)
+
+        for _ in range(self.retries + 1):
+            res = self._call(
+                "transfer.upload.begin",
+                {"name": path.name, "size": size, "sha256": sha256},
+            )
+            if res is None:
+                return None
+            if "path" in res:
+                Logger.debug(f"{path.name} is already on the connector")
+                return res["path"]
+
+            if self._send_chunks(sha256, path, res["offset"], size, progress):
+                res = self._call(
+                    "transfer.upload.end", {"id": sha256, "name": path.name}
+                )
+                return res["path"] if res else None
+
+            Logger.warning(f"upload of {path.name} interrupted, resuming")
+
+        Logger.error(f"failed to upload {path.name} after {self.retries} retries")
+        return None
+
+    def _send_chunks(
+        self,
+        transfer_id: str,
+        path: Path,
+        offset: int,
+        size: int,
+        progress: Optional[ProgressFunc],
+    ) -> bool:
+        # keep up to `window` chunks in flight, replies arrive in order because
+        # inline routes are served sequentially per connection
+        in_flight = 0
+        ok = True
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while in_flight or (ok and offset < size):
+                if ok and offset < size and in_flight < self.window:
+                    chunk = f.read(self.chunk_size)
+                    data = {"id": transfer_id, "offset": offset, **encode_chunk(chunk)}
+                    self.ctx.send(Message("transfer.upload.chunk", data))
+                    offset += len(chunk)
+                    in_flight += 1
+                    continue
+
+                res = Message.from_dict(self.ctx.recv())
+                in_flight -= 1
+                if res.message != TRANSFER_MESSAGE:
+                    Logger.warning(f"upload chunk rejected: {res.data}")
+                    ok = False
+                    continue
+
+                if progress:
+                    progress(res.data["offset"], size)
+
+        return ok
+
+    def download(
+        self, remote_path: str, dest: Path, progress: Optional[ProgressFunc] = None
+    ) -> bool:
+        for _ in range(self.retries + 1):
+            info = self._call("transfer.download.begin", {"path": remote_path})
+            if info is None:
+                return False
+
+            part = dest.with_name(dest.name + ".part")
+            if self._recv_chunks(remote_path, part, info["size"], progress):
+                if file_sha256(part) == info["sha256"]:
+                    os.replace(part, dest)
+                    return True
+
+                Logger.warning(f"checksum mismatch for {dest.name}, starting over")
+                part.unlink()
+                continue
+
+            Logger.warning(f"download of {dest.name} interrupted, resuming")
+
+        Logger.error(f"failed to download {remote_path} after {self.retries} retries")
+        return False
+
+    def _recv_chunks(
+        self,
+        remote_path: str,
+        part: Path,
+        size: int,
+        progress: Optional[ProgressFunc],
+    ) -> bool:
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.touch()
+        offset = part.stat().st_size
+        if offset > size:
+            part.write_bytes(b"")
+            offset = 0
+
+        requested = offset
+        in_flight = 0
+        ok = True
+        with open(part, "ab") as f:
+            while in_flight or (ok and requested < size):
+                if ok and requested < size and in_flight < self.window:
+                    length = min(self.chunk_size, size - requested)
+                    data = {"path": remote_path, "offset": requested, "size": length}
+                    self.ctx.send(Message("transfer.download.chunk", data))
+                    requested += length
+                    in_flight += 1
+                    continue
+
+                res = Message.from_dict(self.ctx.recv())
+                in_flight -= 1
+                if not ok:
+                    continue
+
+                try:
+                    chunk = decode_chunk(res.data)
+                except (KeyError, TypeError, ValueError) as e:
+                    Logger.warning(f"download chunk rejected: {e}")
+                    ok = False
+                    continue
+
+                f.write(chunk)
+                offset += len(chunk)
+                if progress:
+                    progress(offset, size)
+
+        return ok
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from apic_connector.message_queue import MessageQueue, QueueItem
+from shared.messaging import Message
+
+
+def item(message: str) -> QueueItem:
+    return None, Message(message)  # type: ignore
+
+
+def test_put_wakes_the_consumer_once_per_drain():
+    wakeups = []
+    queue = MessageQueue(lambda: wakeups.append(1))
+
+    for _ in range(5):
+        queue.put_nowait(item("core.status"))
+    assert len(wakeups) == 1
+
+    served: list[QueueItem] = []
+    queue.process(served.append, budget=1.0)
+    assert len(served) == 5
+
+    # the drain re-arms the wakeup for the next burst
+    queue.put_nowait(item("core.status"))
+    assert len(wakeups) == 2
+
+
+def test_put_from_another_thread_wakes_without_polling():
+    woken = threading.Event()
+    queue = MessageQueue(woken.set)
+
+    threading.Thread(target=queue.put, args=(item("core.status"),)).start()
+    assert woken.wait(1)
+    assert queue.qsize() == 1
+
+
+def test_process_stops_at_budget_and_requests_another_tick():
+    wakeups = []
+    queue = MessageQueue(lambda: wakeups.append(1))
+    for _ in range(10):
+        queue.put_nowait(item("core.status"))
+
+    def slow(_: QueueItem):
+        time.sleep(0.02)
+
+    queue.process(slow, budget=0.05)
+    assert 0 < queue.qsize() < 10
+    assert len(wakeups) == 2
+
+    while not queue.empty():
+        queue.process(slow, budget=0.05)
+    assert len(wakeups) > 2
+
+
+def test_high_priority_routes_are_served_first():
+    queue = MessageQueue(lambda: None)
+    for message in ("core.file.open", "models.reference", "core.status"):
+        queue.put_nowait(item(message))
+
+    served: list[str] = []
+    queue.process(lambda i: served.append(i[1].message), budget=1.0)
+    assert served == ["core.status", "models.reference", "core.file.open"]
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from apic_studio.scripts.colorspace import (
+    apply_lut,
+    apply_transform,
+    build_lut,
+    srgb_encode,
+    to_byte,
+)
+
+
+def per_channel(r: float, g: float, b: float) -> tuple[float, float, float]:
+    return srgb_encode(r), srgb_encode(g), srgb_encode(b)
+
+
+def mixing(r: float, g: float, b: float) -> tuple[float, float, float]:
+    # stand-in for an ocio view transform, each output depends on all channels
+    luma = 0.2126 * r + 0.7152 * g + 0.0722 * b
+    return tuple(srgb_encode(0.8 * c + 0.2 * luma) for c in (r, g, b))
+
+
+def reference(data: bytes, transform) -> bytes:
+    out = bytearray()
+    for i in range(0, len(data), 3):
+        rgb = transform(*(c / 255.0 for c in data[i : i + 3]))
+        out.extend(to_byte(v) for v in rgb)
+    return bytes(out)
+
+
+@pytest.fixture
+def pixels() -> bytes:
+    rng = random.Random(41)
+    return bytes(rng.randrange(256) for _ in range(3 * 4096))
+
+
+def test_lut_matches_per_channel_transform(pixels: bytes):
+    lut = build_lut(srgb_encode)
+    assert apply_lut(pixels, lut) == reference(pixels, per_channel)
+    assert apply_transform(pixels, per_channel) == reference(pixels, per_channel)
+
+
+def test_channel_mixing_transform_is_applied_per_pixel(pixels: bytes):
+    expected = reference(pixels, mixing)
+    assert apply_transform(pixels, mixing) == expected
+
+    # sampling the mixing transform on grey values can't reproduce it
+    lut = build_lut(lambda v: mixing(v, v, v)[0])
+    assert apply_lut(pixels, lut) != expected
+
+
+def test_transform_cache_is_shared_between_rows():
+    calls = []
+
+    def counting(r: float, g: float, b: float) -> tuple[float, float, float]:
+        calls.append((r, g, b))
+        return r, g, b
+
+    cache: dict[bytes, bytes] = {}
+    row = bytes([10, 20, 30]) * 100
+    assert apply_transform(row, counting, cache) == row
+    assert apply_transform(row, counting, cache) == row
+    assert len(calls) == 1
+
+
+def test_white_stays_white():
+    assert build_lut(srgb_encode)[255] == 255
+    assert apply_transform(b"\xff\xff\xff", per_channel) == b"\xff\xff\xff"
+    with pytest.raises(ValueError):
+        apply_transform(b"\x00\x00", per_channel)
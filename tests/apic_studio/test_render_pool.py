@@ -0,0 +1,155 @@
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from PySide6.QtCore import QCoreApplication
+
+from apic_studio.core.asset import Metadata
+from apic_studio.core.settings import SettingsManager
+from apic_studio.services.render import (
+    PREVIEW_EXTENSION,
+    RenderWorkerPool,
+    is_preview_current,
+    preview_fingerprint,
+)
+
+# speaks the render_worker.py protocol without cinema 4d, the material name
+# picks what happens to it
+WORKER = """
+import json, sys, time
+
+def emit(event, job_id=None, **data):
+    print("@@apic " + json.dumps({"event": event, "id": job_id, **data}), flush=True)
+
+emit("ready", threads=1)
+for line in sys.stdin:
+    job = json.loads(line)
+    if job["type"] == "quit":
+        break
+
+    total = len(job["materials"])
+    for i, material in enumerate(job["materials"], 1):
+        if material.endswith("hang.c4d"):
+            time.sleep(60)
+        if material.endswith("broken.c4d"):
+            emit("failed", job["id"], material=material, error="broken")
+            continue
+
+        output = material[:-4] + ".png"
+        open(output, "w").write("png")
+        emit("progress", job["id"], material=material, output=output, index=i,
+             total=total)
+    emit("done", job["id"])
+"""
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def pool(app, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    settings = SettingsManager().MaterialSettings
+    monkeypatch.setattr(settings, "render_scene", str(tmp_path / "scene.c4d"))
+
+    script = tmp_path / "worker.py"
+    script.write_text(WORKER)
+    pool = RenderWorkerPool([sys.executable, str(script)], size=1)
+    yield pool
+    pool.stop()
+
+
+def wait_until(app, done: Callable[[], bool], timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not done():
+        assert time.monotonic() < deadline, "timed out waiting for the pool"
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def materials(root: Path, *names: str) -> list[Path]:
+    paths: list[Path] = []
+    for name in names:
+        folder = root / name
+        folder.mkdir()
+        path = folder / f"{name}.c4d"
+        path.write_text(name)
+        paths.append(path)
+    return paths
+
+
+def render(app, pool: RenderWorkerPool, paths: list[Path], **kwargs):
+    finished: list[tuple[int, bool]] = []
+    progress: list[str] = []
+    pool.job_finished.connect(lambda job_id, ok: finished.append((job_id, ok)))
+    pool.job_progress.connect(lambda _, output, __, ___: progress.append(output))
+
+    job_id = pool.submit(paths, **kwargs)
+    assert job_id is not None
+    wait_until(app, lambda: bool(finished))
+    assert finished[0][0] == job_id
+    return finished[0][1], progress
+
+
+def test_renders_and_records_previews(app, pool, tmp_path):
+    paths = materials(tmp_path, "wood", "metal", "glass")
+    called: list[bool] = []
+
+    ok, progress = render(app, pool, paths, callback=lambda: called.append(True))
+
+    assert ok and called
+    assert sorted(progress) == sorted(
+        str(p.with_suffix(PREVIEW_EXTENSION)) for p in paths
+    )
+    fingerprint = preview_fingerprint()
+    assert all(is_preview_current(p, fingerprint) for p in paths)
+
+
+def test_skips_current_previews(app, pool, tmp_path):
+    paths = materials(tmp_path, "wood", "metal")
+    render(app, pool, paths)
+
+    paths[1].write_text("edited")
+    ok, progress = render(app, pool, paths)
+
+    # the skipped material reports progress without an output
+    assert ok
+    assert sorted(progress) == ["", str(paths[1].with_suffix(PREVIEW_EXTENSION))]
+
+
+def test_metadata_save_keeps_records(app, pool, tmp_path):
+    paths = materials(tmp_path, "wood")
+    meta = Metadata(paths[0].with_suffix(".json"))
+    meta.load()
+
+    render(app, pool, paths)
+    # the attribute editor saves the metadata it loaded before the render
+    meta.notes = "notes"
+    meta.save()
+
+    assert is_preview_current(paths[0], preview_fingerprint())
+
+
+def test_failed_material_fails_job(app, pool, tmp_path):
+    paths = materials(tmp_path, "wood", "broken")
+
+    ok, progress = render(app, pool, paths)
+
+    assert not ok
+    assert progress == [str(paths[0].with_suffix(PREVIEW_EXTENSION))]
+
+
+def test_watchdog_kills_silent_worker(app, pool, tmp_path, monkeypatch):
+    # changed after the workers started, the next job picks it up
+    assert pool.start()
+    monkeypatch.setattr(SettingsManager().MaterialSettings, "render_timeout", 1)
+
+    ok, _ = render(app, pool, materials(tmp_path, "hang"))
+    assert not ok
+
+    # the next job respawns the worker
+    ok, _ = render(app, pool, materials(tmp_path, "wood"))
+    assert ok
@@ -0,0 +1,69 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from shared.messaging import Message, MessageRouter
+from shared.network import Connection, Server
+from shared.network.connection import HELLO_MESSAGE
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    router = MessageRouter()
+
+    @router.register("echo", inline=True)
+    def echo(conn: Connection, msg: Message):
+        conn.send(Message("echo", msg.data))
+
+    @router.register("crash", inline=True)
+    def crash(conn: Connection, msg: Message):
+        raise TypeError("broken handler")
+
+    server = Server(port=free_port(), router=router)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not server._serving and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def connect(server: Server) -> Connection:
+    conn = Connection.client_connection(timeout=5)
+    conn.timeout = 5
+    conn.connect((server.addr, server.port))
+    assert conn.is_connected
+    return conn
+
+
+def test_handler_error_keeps_serving(server: Server):
+    a, b = connect(server), connect(server)
+
+    res = Message.from_dict(a.send_recv(Message("crash")))
+    assert res.message == "error"
+    assert "broken handler" in res.data
+
+    assert a.send_recv(Message("echo", 1))["data"] == 1
+    assert b.send_recv(Message("echo", 2))["data"] == 2
+
+
+def test_malformed_hello_keeps_serving(server: Server):
+    a, b = connect(server), connect(server)
+
+    res = Message.from_dict(a.send_recv(Message(HELLO_MESSAGE, "not a dict")))
+    assert res.message == "hello"
+    res = Message.from_dict(a.send_recv(Message(HELLO_MESSAGE, {"compression": 1})))
+    assert res.message == "error"
+
+    assert b.send_recv(Message("echo", 3))["data"] == 3
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from shared.messaging import Message
+from shared.messaging.message import MessageCapture
+from shared.network import TransferStore, transfer
+from shared.network.transfer import encode_chunk
+
+
+@pytest.fixture
+def store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TransferStore:
+    store = TransferStore(tmp_path / "transfers")
+    monkeypatch.setattr(transfer, "store", store)
+    return store
+
+
+def serve(route: str, data, timeout: float = 5) -> Message:
+    conn = MessageCapture()
+    transfer.router.serve(conn, Message(route, data))  # type: ignore
+
+    # routes that hash files reply from the hash pool
+    deadline = time.monotonic() + timeout
+    while not conn.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return conn.result
+
+
+@pytest.mark.parametrize(
+    "route, data",
+    [
+        ("transfer.upload.begin", {"name": None, "size": None, "sha256": None}),
+        ("transfer.upload.begin", {"name": "a", "size": "1", "sha256": 1}),
+        ("transfer.upload.chunk", {"id": None, "offset": None}),
+        ("transfer.upload.chunk", {"id": "0" * 64, "offset": -1, "data": None}),
+        ("transfer.upload.end", {"id": None, "name": None}),
+        ("transfer.download.begin", {"path": None}),
+        ("transfer.download.chunk", {"path": None, "offset": None, "size": None}),
+        ("transfer.upload.chunk", ["not", "a", "dict"]),
+        ("transfer.download.begin", "not a dict"),
+    ],
+)
+def test_malformed_requests_are_rejected(store: TransferStore, route: str, data):
+    assert serve(route, data).message == "error"
+
+
+def test_upload_roundtrip(store: TransferStore, tmp_path: Path):
+    payload = b"apic" * 1000
+    sha = hashlib.sha256(payload).hexdigest()
+
+    res = serve("transfer.upload.begin", {"name": "a.c4d", "size": 4000, "sha256": sha})
+    assert res.data["offset"] == 0
+
+    for offset in range(0, len(payload), 1500):
+        chunk = {"id": sha, "offset": offset, **encode_chunk(payload[offset:][:1500])}
+        assert serve("transfer.upload.chunk", chunk).message == "transfer"
+
+    # hashed while the chunks arrived, finishing doesn't read the file again
+    assert store.is_hashed(sha)
+    res = serve("transfer.upload.end", {"id": sha, "name": "a.c4d"})
+    assert Path(res.data["path"]).read_bytes() == payload
+
+
+def test_download_is_limited_to_allowed_roots(store: TransferStore, tmp_path: Path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("secret")
+    export = tmp_path / "pool" / "asset"
+    export.mkdir(parents=True)
+    (export / "asset.c4d").write_bytes(b"scene")
+
+    for path in (secret, export / ".." / ".." / "secret.txt", export / "asset.c4d"):
+        res = serve("transfer.download.begin", {"path": str(path)})
+        assert res.message == "error"
+        chunk = {"path": str(path), "offset": 0, "size": 10}
+        assert serve("transfer.download.chunk", chunk).message == "error"
+
+    store.allow_download(export)
+    res = serve("transfer.download.begin", {"path": str(export / "asset.c4d")})
+    assert res.data["size"] == 5
+    res = serve("transfer.download.begin", {"path": str(secret)})
+    assert res.message == "error"
+
+
+def wait_for_reply(conn: MessageCapture) -> Message:
+    deadline = time.monotonic() + 5
+    while not conn.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return conn.result
+
+
+def test_hashing_runs_off_the_selector_thread(
+    store: TransferStore, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    release = threading.Event()
+    file_sha256 = transfer.file_sha256
+
+    def blocked_sha256(path: Path) -> str:
+        release.wait(5)
+        return file_sha256(path)
+
+    monkeypatch.setattr(transfer, "file_sha256", blocked_sha256)
+
+    # a part left by an earlier session has no running digest
+    payload = b"x" * 10_000
+    sha = hashlib.sha256(payload).hexdigest()
+    store.part_path(sha).parent.mkdir(parents=True)
+    store.part_path(sha).write_bytes(payload)
+    store.allow_download(tmp_path)
+    source = tmp_path / "source.bin"
+    source.write_bytes(payload)
+
+    upload, download = MessageCapture(), MessageCapture()
+    end = Message("transfer.upload.end", {"id": sha, "name": "a.c4d"})
+    begin = Message("transfer.download.begin", {"path": str(source)})
+    transfer.router.serve(upload, end)  # type: ignore
+    transfer.router.serve(download, begin)  # type: ignore
+    assert not upload.messages and not download.messages
+
+    release.set()
+    assert Path(wait_for_reply(upload).data["path"]).read_bytes() == payload
+    assert wait_for_reply(download).data["sha256"] == sha
+    assert store.download_info(source, cached=True) == download.result.data